@@ -0,0 +1,152 @@
+"""
+RAG 语义答案缓存
+同一项目内语义相近、且检索到相同资料的问题直接复用已生成的回答
+"""
+import hashlib
+import json
+import math
+import operator
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+
+
+def normalize_vector(vector: List[float]) -> List[float]:
+    """L2 归一化，归一化后点积即余弦相似度"""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+def history_fingerprint(messages: Optional[List[Dict]]) -> str:
+    """
+    历史对话 (含会话摘要) 的指纹
+
+    提示词包含历史，同一问题在不同对话上下文中的回答不能互相复用 (如 "换个说法解释")
+    """
+    if not messages:
+        return ""
+    payload = json.dumps(messages, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """
+    进程内答案缓存
+
+    缓存键: (project_id, 归一化查询向量 (相似度阈值内匹配), 检索到的 chunk id 集合, variant)，
+    variant 由对话模式与历史对话指纹组成
+    项目向量集合发生变化时整体失效。
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        similarity_threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        self.enabled = settings.answer_cache_enabled if enabled is None else enabled
+        self.similarity_threshold = (
+            settings.answer_cache_similarity if similarity_threshold is None else similarity_threshold
+        )
+        self.max_entries = settings.answer_cache_max_entries if max_entries is None else max_entries
+        self.ttl_seconds = settings.answer_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        self._entries: Dict[str, "OrderedDict[int, Dict]"] = {}
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(
+        self,
+        project_id: str,
+        query_embedding: List[float],
+        chunk_ids: Iterable[str],
+        variant: str = ""
+    ) -> Optional[Dict]:
+        """
+        查找缓存的回答
+
+        variant 区分不同生成配置 (对话模式、历史对话)，仅匹配相同 variant 的条目
+
+        Returns:
+            {"content": "...", "reasoning_trace": "...", "similarity": 0.98} 或 None
+        """
+        entries = self._entries.get(project_id)
+        if not entries:
+            self.misses += 1
+            return None
+
+        vector = normalize_vector(query_embedding)
+        chunk_set = frozenset(chunk_ids)
+        now = time.monotonic()
+
+        best_key = None
+        best_score = self.similarity_threshold
+        for key, entry in list(entries.items()):
+            if now - entry["created_at"] > self.ttl_seconds:
+                del entries[key]
+                continue
+            if entry["variant"] != variant or entry["chunk_ids"] != chunk_set:
+                continue
+            score = sum(map(operator.mul, vector, entry["vector"]))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        entries.move_to_end(best_key)
+        self.hits += 1
+        entry = entries[best_key]
+        return {
+            "content": entry["content"],
+            "reasoning_trace": entry["reasoning_trace"],
+            "similarity": best_score
+        }
+
+    def store(
+        self,
+        project_id: str,
+        query_embedding: List[float],
+        chunk_ids: Iterable[str],
+        content: str,
+        reasoning_trace: str = "",
+        variant: str = ""
+    ) -> None:
+        """写入回答 (每个项目按 LRU 保留 max_entries 条)"""
+        entries = self._entries.setdefault(project_id, OrderedDict())
+        self._next_key += 1
+        entries[self._next_key] = {
+            "vector": normalize_vector(query_embedding),
+            "chunk_ids": frozenset(chunk_ids),
+            "variant": variant,
+            "content": content,
+            "reasoning_trace": reasoning_trace,
+            "created_at": time.monotonic()
+        }
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, project_id: str) -> None:
+        """项目向量集合变化时清空该项目缓存"""
+        self._entries.pop(project_id, None)
+
+    def get_stats(self) -> Dict:
+        """缓存统计"""
+        return {
+            "enabled": self.enabled,
+            "projects": len(self._entries),
+            "entries": sum(len(entries) for entries in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# 全局实例
+answer_cache = AnswerCache()
@@ -0,0 +1,107 @@
+"""
+对话模式
+按延迟分档 (fast / standard / deep) 选择模型、推理开关、检索数量与输出长度，
+auto 模式根据问题特征自动选择
+"""
+import re
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.tokenizer import count_tokens
+
+AUTO_MODE = "auto"
+
+CHAT_MODES: Dict[str, Dict] = {
+    # 简单查找: 非推理模型，少量资料，短回答
+    "fast": {
+        "model": settings.fast_llm_model,
+        "reasoning": False,
+        "top_k": 3,
+        "max_tokens": 1024
+    },
+    # 常规问答: 非推理模型，标准检索
+    "standard": {
+        "model": settings.fast_llm_model,
+        "reasoning": False,
+        "top_k": 5,
+        "max_tokens": 4096
+    },
+    # 深度分析: 推理模型 (DeepSeek R1)，检索数量与引入模式前的默认值 (5) 一致
+    "deep": {
+        "model": settings.llm_model,
+        "reasoning": True,
+        "top_k": 5,
+        "max_tokens": 8192
+    }
+}
+
+# 需要推理的问题特征
+_DEEP_PATTERNS = re.compile(
+    r"为什么|为何|原因|比较|对比|区别|异同|分析|评价|推导|证明|权衡|优缺点|如何设计|是否合理"
+    r"|\bwhy\b|\bcompare\b|\bcontrast\b|\bdifference|\banaly[sz]e|\bevaluate\b|\bderive\b"
+    r"|\bprove\b|\btrade-?offs?\b|\bpros and cons\b|\bcritique\b",
+    re.IGNORECASE
+)
+
+# 简单查找的问题特征
+_LOOKUP_PATTERNS = re.compile(
+    r"是什么|什么是|定义|哪一?[个篇年位]|谁|何时|多少|叫什么|出处|作者"
+    r"|^\s*(what is|what are|who|when|where|which|define|list)\b",
+    re.IGNORECASE
+)
+
+# 公式或代码通常需要推理
+_FORMULA_PATTERN = re.compile(r"\$[^$]+\$|\\[a-z]+\{|```")
+
+FAST_MAX_TOKENS = 40
+DEEP_MIN_TOKENS = 120
+
+
+def route_query(query: str) -> Tuple[str, str]:
+    """
+    根据问题特征选择模式
+
+    Returns:
+        (mode, reason)
+    """
+    tokens = count_tokens(query)
+    questions = len(re.findall(r"[?？]", query))
+
+    if _FORMULA_PATTERN.search(query):
+        return "deep", "contains formula or code"
+    if _DEEP_PATTERNS.search(query):
+        return "deep", "reasoning keywords"
+    if tokens >= DEEP_MIN_TOKENS or questions >= 3:
+        return "deep", f"long or multi-part question ({tokens} tokens, {questions} questions)"
+    if tokens <= FAST_MAX_TOKENS and _LOOKUP_PATTERNS.search(query):
+        return "fast", "short lookup question"
+    return "standard", "default"
+
+
+def resolve_mode(mode: Optional[str], query: str) -> Tuple[str, Dict, str]:
+    """
+    解析请求的模式
+
+    Args:
+        mode: fast / standard / deep / auto / None (None 取配置 chat_default_mode)
+        query: 用户问题 (auto 模式路由使用)
+
+    Returns:
+        (mode, profile, reason)
+
+    Raises:
+        ValueError: 未知模式
+    """
+    mode = mode or settings.chat_default_mode
+    if mode == AUTO_MODE:
+        routed, reason = route_query(query)
+        print(f"[chat router] mode={routed} reason={reason} query={query[:80]!r}")
+        return routed, CHAT_MODES[routed], reason
+    if mode not in CHAT_MODES:
+        raise ValueError(f"Unknown chat mode: {mode}")
+    return mode, CHAT_MODES[mode], "requested"
+
+
+def is_valid_mode(mode: Optional[str]) -> bool:
+    """检查模式名是否合法 (None 表示使用默认模式)"""
+    return mode is None or mode == AUTO_MODE or mode in CHAT_MODES
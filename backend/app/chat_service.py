@@ -4,27 +4,40 @@ DeepSeek R1 对话服务
 """
 import json
 from typing import AsyncGenerator, List, Dict, Optional
-from openai import AsyncOpenAI
 
+from starlette.concurrency import run_in_threadpool
+
+from app.answer_cache import answer_cache, history_fingerprint
+from app.chat_modes import resolve_mode
 from app.config import settings
+from app.context_packer import context_packer
+from app.llm_client import get_async_client, llm_stats
+from app.metrics import CHAT_STAGE_SECONDS
+from app.tokenizer import count_tokens
+from app.tracing import span
 from app.vector_store import vector_store
 
+# 缓存回放时每个事件携带的字符数
+CACHE_REPLAY_CHUNK_CHARS = 256
+
 
 class ChatService:
     """DeepSeek R1 对话服务"""
 
     def __init__(self):
-        self.client = AsyncOpenAI(
-            base_url=settings.openrouter_base_url,
-            api_key=settings.openrouter_api_key
-        )
         self.model = settings.llm_model
 
+    @property
+    def client(self):
+        """共享异步客户端 (首次使用时创建)"""
+        return get_async_client()
+
     async def retrieve_context(
         self,
         project_id: str,
         query: str,
-        top_k: int = 5
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         从 ChromaDB 检索相关上下文
@@ -33,10 +46,12 @@ class ChatService:
             project_id: 项目ID
             query: 查询文本
             top_k: 返回结果数量
+            query_embedding: 已计算好的查询向量 (可选)
 
         Returns:
             [
                 {
+                    "id": "...",
                     "text": "...",
                     "metadata": {...},
                     "distance": 0.23
@@ -44,15 +59,19 @@ class ChatService:
                 ...
             ]
         """
-        results = vector_store.search(
+        # 嵌入请求与 ChromaDB 查询是同步调用，在线程池中执行以免阻塞事件循环
+        results = await run_in_threadpool(
+            vector_store.search,
             project_id=project_id,
             query=query,
-            top_k=top_k
+            top_k=top_k,
+            query_embedding=query_embedding
         )
 
         contexts = []
         for i in range(len(results["documents"])):
             contexts.append({
+                "id": results["ids"][i],
                 "text": results["documents"][i],
                 "metadata": results["metadatas"][i],
                 "distance": results["distances"][i]
@@ -70,7 +89,7 @@ class ChatService:
 
         Args:
             query: 用户问题
-            contexts: 检索到的上下文
+            contexts: 检索到的上下文 (打包后的上下文带 rank，引用编号与检索结果一致)
 
         Returns:
             完整提示词
@@ -80,7 +99,8 @@ class ChatService:
 
         # 构建上下文部分
         context_parts = []
-        for i, ctx in enumerate(contexts, 1):
+        for position, ctx in enumerate(contexts, 1):
+            i = ctx.get("rank", position)
             source = ctx["metadata"].get("source_file", "Unknown")
             section = ctx["metadata"].get("section", "")
             text = ctx["text"]
@@ -111,9 +131,11 @@ class ChatService:
         self,
         project_id: str,
         query: str,
-        top_k: int = 5,
+        top_k: Optional[int] = None,
         use_rag: bool = True,
-        messages_history: Optional[List[Dict]] = None
+        messages_history: Optional[List[Dict]] = None,
+        use_cache: Optional[bool] = None,
+        mode: Optional[str] = None
     ) -> AsyncGenerator[Dict, None]:
         """
         流式对话
@@ -121,55 +143,103 @@ class ChatService:
         Args:
             project_id: 项目ID
             query: 用户问题
-            top_k: RAG 检索数量
+            top_k: RAG 检索数量 (默认取模式配置)
             use_rag: 是否使用 RAG
             messages_history: 历史对话 (可选)
+            use_cache: 是否使用语义答案缓存 (默认取配置 answer_cache_enabled)
+            mode: fast / standard / deep / auto (默认取配置 chat_default_mode)
 
         Yields:
             {
-                "type": "search" | "reasoning" | "content_chunk",
+                "type": "mode" | "search" | "reasoning" | "content_chunk",
                 "content": "...",
-                "contexts": [...]  # 仅 type=search 时
+                "contexts": [...],  # 仅 type=search 时
+                "prompt": {...}  # 仅 type=search 时, 提示词 token 统计
             }
         """
+        mode, profile, reason = resolve_mode(mode, query)
+        if top_k is None:
+            top_k = profile["top_k"]
+        yield {
+            "type": "mode",
+            "mode": mode,
+            "reason": reason,
+            "model": profile["model"]
+        }
+
+        if use_cache is None:
+            use_cache = answer_cache.enabled
+        use_cache = use_cache and use_rag
+
         # 1. RAG 检索
         contexts = []
+        query_embedding = None
         if use_rag:
-            contexts = await self.retrieve_context(project_id, query, top_k)
+            with CHAT_STAGE_SECONDS.time(stage="retrieval"), span("retrieval", cat="chat", top_k=top_k):
+                if use_cache:
+                    query_embedding = await run_in_threadpool(vector_store.get_embedding, query)
+                contexts = await self.retrieve_context(
+                    project_id, query, top_k, query_embedding=query_embedding
+                )
+
+        # 2. 构建提示词 (参考资料按 token 预算打包)
+        if use_rag and contexts:
+            with CHAT_STAGE_SECONDS.time(stage="prompt_build"), span("prompt_build", cat="chat"):
+                packed, prompt_stats = context_packer.pack(query, contexts)
+                final_query = self.build_rag_prompt(query, packed)
+        else:
+            prompt_stats = {}
+            final_query = query
+
+        if use_rag:
+            prompt_stats["prompt_tokens"] = count_tokens(final_query)
             yield {
                 "type": "search",
                 "content": f"检索到 {len(contexts)} 条相关资料",
-                "contexts": contexts
+                "contexts": contexts,
+                "prompt": prompt_stats
             }
 
-        # 2. 构建提示词
-        if use_rag and contexts:
-            final_query = self.build_rag_prompt(query, contexts)
-        else:
-            final_query = query
-
-        # 3. 构建消息列表
-        messages = messages_history or []
+        # 命中缓存时按相同事件协议回放，不再调用 LLM
+        # (历史对话与摘要也在提示词中，缓存按模式 + 历史指纹区分)
+        chunk_ids = [ctx["id"] for ctx in contexts]
+        cache_variant = f"{mode}:{history_fingerprint(messages_history)}"
+        if use_cache:
+            cached = answer_cache.lookup(project_id, query_embedding, chunk_ids, variant=cache_variant)
+            if cached:
+                async for event in self._replay_cached(cached, contexts, mode):
+                    yield event
+                return
+
+        # 3. 构建消息列表 (复制历史，避免修改调用方的列表)
+        messages = list(messages_history or [])
         messages.append({
             "role": "user",
             "content": final_query
         })
 
-        # 4. 调用 DeepSeek R1
+        # 4. 按模式调用模型 (deep 模式为 DeepSeek R1 推理)
+        timer = llm_stats.start("chat", profile["model"])
         try:
             stream = await self.client.chat.completions.create(
-                model=self.model,
+                model=profile["model"],
                 messages=messages,
                 stream=True,
                 temperature=0.2,
-                max_tokens=8192,
-                extra_body={"reasoning": {"enabled": True}}
+                max_tokens=profile["max_tokens"],
+                stream_options={"include_usage": True},
+                extra_body={"reasoning": {"enabled": profile["reasoning"]}}
             )
 
-            full_content = ""
-            reasoning_trace = ""
+            content_parts: List[str] = []
+            reasoning_parts: List[str] = []
+            output_tokens = None
 
             async for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage and usage.completion_tokens:
+                    output_tokens = usage.completion_tokens
+
                 delta = chunk.choices[0].delta if chunk.choices else None
                 if not delta:
                     continue
@@ -185,7 +255,8 @@ class ChatService:
                             reasoning = json.dumps(value, ensure_ascii=False)
                         break
                 if reasoning:
-                    reasoning_trace += reasoning
+                    timer.first_token()
+                    reasoning_parts.append(reasoning)
                     yield {
                         "type": "reasoning",
                         "content": reasoning
@@ -194,33 +265,81 @@ class ChatService:
                 # 提取回复内容
                 content = delta.content
                 if content:
-                    full_content += content
+                    timer.first_token()
+                    content_parts.append(content)
                     yield {
                         "type": "content_chunk",
                         "content": content
                     }
 
+            full_content = "".join(content_parts)
+            reasoning_trace = "".join(reasoning_parts)
+            if output_tokens is None:
+                output_tokens = count_tokens(full_content) + count_tokens(reasoning_trace)
+            timer.finish(output_tokens)
+
+            if use_cache and full_content:
+                answer_cache.store(
+                    project_id, query_embedding, chunk_ids, full_content, reasoning_trace,
+                    variant=cache_variant
+                )
+
             # 5. 返回完整响应元数据
             yield {
                 "type": "done",
                 "full_content": full_content,
                 "reasoning_trace": reasoning_trace,
-                "contexts": contexts
+                "contexts": contexts,
+                "mode": mode
             }
 
         except Exception as e:
+            timer.finish(error=True)
             yield {
                 "type": "error",
                 "content": str(e)
             }
 
+    async def _replay_cached(
+        self,
+        cached: Dict,
+        contexts: List[Dict],
+        mode: str
+    ) -> AsyncGenerator[Dict, None]:
+        """以流式事件回放缓存的回答"""
+        reasoning_trace = cached["reasoning_trace"] or ""
+        full_content = cached["content"]
+
+        for start in range(0, len(reasoning_trace), CACHE_REPLAY_CHUNK_CHARS):
+            yield {
+                "type": "reasoning",
+                "content": reasoning_trace[start:start + CACHE_REPLAY_CHUNK_CHARS]
+            }
+        for start in range(0, len(full_content), CACHE_REPLAY_CHUNK_CHARS):
+            yield {
+                "type": "content_chunk",
+                "content": full_content[start:start + CACHE_REPLAY_CHUNK_CHARS]
+            }
+
+        yield {
+            "type": "done",
+            "full_content": full_content,
+            "reasoning_trace": reasoning_trace,
+            "contexts": contexts,
+            "mode": mode,
+            "cached": True,
+            "similarity": cached["similarity"]
+        }
+
     async def chat(
         self,
         project_id: str,
         query: str,
-        top_k: int = 5,
+        top_k: Optional[int] = None,
         use_rag: bool = True,
-        messages_history: Optional[List[Dict]] = None
+        messages_history: Optional[List[Dict]] = None,
+        use_cache: Optional[bool] = None,
+        mode: Optional[str] = None
     ) -> Dict:
         """
         非流式对话 (收集完整响应)
@@ -229,30 +348,46 @@ class ChatService:
             {
                 "content": "...",
                 "reasoning_trace": "...",
-                "contexts": [...]
+                "contexts": [...],
+                "mode": "deep",
+                "cached": false
             }
         """
-        full_content = ""
-        reasoning_trace = ""
+        content_parts: List[str] = []
+        reasoning_parts: List[str] = []
+        full_content = None
+        reasoning_trace = None
         contexts = []
+        mode_used = None
+        cached = False
 
         async for event in self.chat_stream(
-            project_id, query, top_k, use_rag, messages_history
+            project_id, query, top_k, use_rag, messages_history, use_cache, mode
         ):
-            if event["type"] == "search":
+            if event["type"] == "mode":
+                mode_used = event["mode"]
+            elif event["type"] == "search":
                 contexts = event.get("contexts", [])
             elif event["type"] == "content_chunk":
-                full_content += event["content"]
+                content_parts.append(event["content"])
             elif event["type"] == "reasoning":
-                reasoning_trace += event["content"]
+                reasoning_parts.append(event["content"])
             elif event["type"] == "done":
-                full_content = event.get("full_content", full_content)
-                reasoning_trace = event.get("reasoning_trace", reasoning_trace)
+                full_content = event.get("full_content")
+                reasoning_trace = event.get("reasoning_trace")
+                cached = event.get("cached", False)
+
+        if full_content is None:
+            full_content = "".join(content_parts)
+        if reasoning_trace is None:
+            reasoning_trace = "".join(reasoning_parts)
 
         return {
             "content": full_content,
             "reasoning_trace": reasoning_trace,
-            "contexts": contexts
+            "contexts": contexts,
+            "mode": mode_used,
+            "cached": cached
         }
 
 
@@ -0,0 +1,92 @@
+"""
+响应压缩中间件
+只压缩一次性返回的完整响应体 (JSON 列表等)，流式响应 (SSE / 分块导出) 原样透传，
+避免压缩缓冲打断逐事件下发。客户端支持且安装了 brotli 时优先使用 br，否则使用 gzip
+"""
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli  # 可选依赖
+except ImportError:  # pragma: no cover - 未安装时只提供 gzip
+    brotli = None
+
+
+def _choose_encoding(accept_encoding: str) -> str:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return ""
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        # br 质量 0-11，这里把 gzip 风格的 1-9 等级映射过去
+        return brotli.compress(body, quality=min(level + 2, 11))
+    return gzip.compress(body, compresslevel=level)
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 压缩超过 minimum_size 字节的完整响应"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 5) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or content_type.startswith("text/event-stream"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not start_message:
+                # 流式响应: 直接透传
+                if start_message:
+                    await send(start_message)
+                    start_message = {}
+                passthrough = True
+                await send(message)
+                return
+
+            if len(body) >= self.minimum_size:
+                body = _compress(body, encoding, self.level)
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+
+            await send(start_message)
+            start_message = {}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
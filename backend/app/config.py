@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -13,15 +14,57 @@ class Settings(BaseSettings):
     # API Settings
     api_host: str = "127.0.0.1"
     api_port: int = 8000
+    api_workers: int = 1  # >1 时为多进程模式，需要同时配置 chroma_server_host
     cors_allow_origins: str = "*"
+    response_compression_min_size: int = 1024  # 超过该字节数的响应启用 gzip/br 压缩, <=0 关闭
+
+    # SSE Streaming
+    sse_flush_interval_ms: int = 50  # 文本增量最长缓冲时间, <=0 关闭合并
+    sse_flush_bytes: int = 2048  # 文本增量缓冲达到该字节数立即下发
+    sse_replay_buffer_size: int = 2048  # 每个流保留的事件数 (断线续传)
+    sse_stream_ttl_seconds: int = 300  # 流结束后保留多久供重连
 
     # OpenRouter API
     openrouter_api_key: str = ""
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
 
+    # OpenRouter Client (共享连接池与重试)
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry: float = 60.0
+    llm_connect_timeout: float = 5.0
+    llm_read_timeout: float = 120.0  # 推理模型 token 间隔可能很长
+    llm_write_timeout: float = 10.0
+    llm_pool_timeout: float = 10.0
+    llm_max_retries: int = 3  # 429 / 5xx 指数退避重试次数
+    llm_stats_window: int = 500  # 延迟统计保留的最近调用数
+
     # AI Models
     llm_model: str = "deepseek/deepseek-r1"
+    fast_llm_model: str = "deepseek/deepseek-chat"  # fast / standard 模式 (无推理)
+    chat_default_mode: str = "deep"  # fast / standard / deep / auto
     embedding_model: str = "qwen/qwen3-embedding-4b"
+    summary_model: str = "deepseek/deepseek-chat"  # 会话摘要 (无需推理)
+
+    # Admission Control
+    scheduler_global_limit: int = 6  # 同时进行的检索 + 生成上限
+    scheduler_project_limit: int = 2  # 单个项目同时进行的对话生成上限
+    scheduler_queue_size: int = 16  # 等待队列长度, 超出返回 429
+    scheduler_search_reserved: int = 1  # 为交互式检索预留的全局名额
+
+    # RAG Context Packing
+    rag_context_token_budget: int = 3000  # 参考资料总 token 上限, <=0 不限制
+    rag_chunk_max_tokens: int = 600  # 单条参考资料 token 上限, <=0 不限制
+
+    # Answer Cache (语义答案缓存, 默认关闭)
+    answer_cache_enabled: bool = False
+    answer_cache_similarity: float = 0.95  # 查询向量余弦相似度阈值
+    answer_cache_max_entries: int = 256  # 每个项目保留条数
+    answer_cache_ttl_seconds: int = 86400
+
+    # Conversation History
+    history_token_budget: int = 4000  # 注入提示词的历史对话 token 上限 (含摘要)
+    history_summary_max_tokens: int = 800  # 滚动摘要长度上限
 
     # MinerU API
     mineru_api_token: str = ""
@@ -32,6 +75,36 @@ class Settings(BaseSettings):
     # Local Database Paths
     sqlite_db_path: str = str(_default_base / "papermem.db")
     chroma_persist_dir: str = str(_default_base / "chromadb")
+    # ChromaDB 服务模式 (多进程部署时必填，所有 worker 通过 HTTP 访问同一个 chroma 进程)
+    chroma_server_host: str = ""
+    chroma_server_port: int = 8001
+
+    # SQLite Tuning
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 64 * 1024
+    sqlite_pool_size: int = 10
+    # 后台删除项目时每批删除的行数 (每批单独提交，缩短写锁持有时间)
+    delete_batch_size: int = 500
+    # 项目导出 / 导入每批处理的行数与向量数 (内存占用与项目大小无关)
+    transfer_batch_size: int = 500
+    # 项目统计计数器校准周期 (小时)，<=0 时只在手动调用时校准
+    stats_reconcile_interval_hours: float = 24
+
+    # Embedding Cache (SQLite 持久化，多个 worker 共享)
+    # 为空时只在多进程模式 (api_workers > 1) 开启: 每个块一行 float32 向量，会显著增大主数据库
+    embedding_cache_enabled: Optional[bool] = None
+    embedding_cache_max_entries: int = 50000
+
+    # Ingest Coordination
+    ingest_lease_seconds: int = 120  # 解析任务租约，持有者定期续约，过期后可由其他 worker 接管
+    ingest_max_attempts: int = 3  # 中断 / 失败的解析任务最多自动领取的次数
+    ingest_reaper_interval_seconds: int = 60  # 扫描过期租约的周期, <=0 只在启动时扫描
+    ingest_retry_failed: bool = False  # 扫描时同时重试解析失败的任务 (会重新提交 MinerU 任务，消耗配额)
+
+    # Request Tracing (Chrome Trace 格式，写入 trace_dir)
+    tracing_enabled: bool = False
+    trace_dir: str = str(_default_base / "traces")
 
     # File Storage Paths
     raw_files_dir: str = str(_default_base / "Raw")
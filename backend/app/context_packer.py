@@ -0,0 +1,168 @@
+"""
+RAG 上下文打包
+在 token 预算内装入检索结果：去除块间重叠句子，超长块只保留与问题最相关的句子
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.tokenizer import count_tokens
+
+# 句子边界: 中英文句末标点或换行
+_SENTENCE_RE = re.compile(r"[^。！？!?；;\n]+?(?:[。！？!?；;]+|\.(?=\s|$)|$)", re.MULTILINE)
+_WORD_RE = re.compile(r"[a-z0-9]{2,}")
+_CJK_RUN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+
+# 短于此长度的句子 (标题、编号等) 不参与去重
+MIN_DEDUPE_CHARS = 8
+
+GAP_MARKER = " … "
+
+
+def _terms(text: str) -> set:
+    """提取词项: 英文单词 + 中文二元组"""
+    text = text.lower()
+    terms = set(_WORD_RE.findall(text))
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def _normalize(sentence: str) -> str:
+    return re.sub(r"\s+", "", sentence).lower()
+
+
+class ContextPacker:
+    """将检索结果装入 token 预算"""
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        chunk_max_tokens: Optional[int] = None
+    ):
+        self.token_budget = settings.rag_context_token_budget if token_budget is None else token_budget
+        self.chunk_max_tokens = settings.rag_chunk_max_tokens if chunk_max_tokens is None else chunk_max_tokens
+
+    def _split(self, text: str) -> List[Tuple[int, int]]:
+        """切分句子，返回 (start, end) 区间"""
+        spans = []
+        for match in _SENTENCE_RE.finditer(text):
+            if match.group().strip():
+                spans.append(match.span())
+        return spans
+
+    def _select(
+        self,
+        text: str,
+        spans: List[Tuple[int, int]],
+        query_terms: set,
+        max_tokens: int
+    ) -> str:
+        """按相关度挑选句子直到达到 max_tokens，保持原文顺序"""
+        scored = []
+        for position, (start, end) in enumerate(spans):
+            overlap = len(query_terms & _terms(text[start:end]))
+            scored.append((-overlap, position))
+        scored.sort()
+
+        chosen = []
+        used = 0
+        for _, position in scored:
+            start, end = spans[position]
+            tokens = count_tokens(text[start:end])
+            if used + tokens > max_tokens:
+                continue
+            chosen.append(position)
+            used += tokens
+        chosen.sort()
+
+        # 相邻句子保留原文间隔，不相邻的用省略号连接
+        parts = []
+        previous = None
+        for position in chosen:
+            start, end = spans[position]
+            if previous is None:
+                parts.append(text[start:end].strip())
+            elif position == previous + 1:
+                parts.append(text[spans[previous][1]:end].rstrip())
+            else:
+                parts.append(GAP_MARKER + text[start:end].strip())
+            previous = position
+        return "".join(parts)
+
+    def pack(self, query: str, contexts: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """
+        打包上下文
+
+        Args:
+            query: 用户问题
+            contexts: 按相关度排序的检索结果
+
+        Returns:
+            (packed_contexts, stats)
+            packed_contexts 中每项带 rank 字段 (原检索序号，用于引用标注)
+            stats = {
+                "context_tokens_before": 2400,
+                "context_tokens_after": 1500,
+                "saved_tokens": 900,
+                "contexts_packed": 4,
+                "contexts_dropped": 1
+            }
+        """
+        query_terms = _terms(query)
+        seen = set()
+        remaining = self.token_budget if self.token_budget > 0 else None
+        before = 0
+        after = 0
+        packed = []
+
+        for rank, ctx in enumerate(contexts, 1):
+            text = ctx.get("text") or ""
+            before += count_tokens(text)
+            if remaining is not None and remaining <= 0:
+                continue
+
+            # 去除与排名更高的块重复的句子
+            all_spans = self._split(text)
+            spans = []
+            for start, end in all_spans:
+                key = _normalize(text[start:end])
+                if len(key) >= MIN_DEDUPE_CHARS:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                spans.append((start, end))
+            if not spans:
+                continue
+
+            limit = self.chunk_max_tokens if self.chunk_max_tokens > 0 else None
+            if remaining is not None:
+                limit = remaining if limit is None else min(limit, remaining)
+
+            if len(spans) == len(all_spans) and (limit is None or count_tokens(text) <= limit):
+                trimmed = text
+            else:
+                trimmed = self._select(text, spans, query_terms, limit if limit is not None else 1 << 30)
+            if not trimmed:
+                continue
+
+            tokens = count_tokens(trimmed)
+            after += tokens
+            if remaining is not None:
+                remaining -= tokens
+            packed.append({**ctx, "text": trimmed, "rank": rank})
+
+        stats = {
+            "context_tokens_before": before,
+            "context_tokens_after": after,
+            "saved_tokens": before - after,
+            "contexts_packed": len(packed),
+            "contexts_dropped": len(contexts) - len(packed)
+        }
+        return packed, stats
+
+
+# 全局实例
+context_packer = ContextPacker()
@@ -0,0 +1,23 @@
+"""
+分页游标
+keyset 分页的游标是上一页最后一行的排序键 (时间 + ID)，编码为不透明的 URL 安全字符串
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标 (格式无效时抛出 ValueError)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), str(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.metrics import SQLITE_COMMIT_SECONDS
 
 # 获取 SQLite 数据库路径
 sqlite_path = settings.get_sqlite_path()
@@ -9,17 +15,96 @@ sqlite_path = settings.get_sqlite_path()
 # 创建 SQLite 数据库连接
 # check_same_thread=False 允许多线程访问
 sqlite_dsn = f"sqlite:///{sqlite_path}"
+# 异步端点使用 aiosqlite，数据库 I/O 不阻塞事件循环
+sqlite_async_dsn = f"sqlite+aiosqlite:///{sqlite_path}"
+
+
+def apply_sqlite_pragmas(dbapi_connection, _connection_record=None) -> None:
+    """
+    每个新连接设置 SQLite pragma
+
+    - WAL: 读写互不阻塞，流式写消息时列表查询不再等待
+    - synchronous=NORMAL: WAL 模式下安全且显著减少 fsync
+    - busy_timeout: 写锁冲突时等待而不是立即报 database is locked
+    - mmap / cache_size: 减少读路径的系统调用与页缓存失效
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        # 负数表示以 KiB 为单位
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def create_sqlite_engine(dsn: str, tuned: bool = True) -> Engine:
+    """
+    创建 SQLite 引擎
+
+    使用连接池 (每个线程独立连接)，tuned=False 时为未调优的默认配置 (用于基准对比)。
+    """
+    if not tuned:
+        return create_engine(
+            dsn,
+            connect_args={"check_same_thread": False},
+            pool_pre_ping=True,
+        )
+
+    sqlite_engine = create_engine(
+        dsn,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        },
+        pool_size=settings.sqlite_pool_size,
+        max_overflow=settings.sqlite_pool_size,
+    )
+    event.listen(sqlite_engine, "connect", apply_sqlite_pragmas)
+    return sqlite_engine
+
+
+def create_async_sqlite_engine(dsn: str) -> AsyncEngine:
+    """创建 aiosqlite 异步引擎 (pragma 与同步引擎一致)"""
+    sqlite_async_engine = create_async_engine(
+        dsn,
+        connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000},
+        # aiosqlite 默认 NullPool (每次新建连接)，显式使用连接池复用连接
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.sqlite_pool_size,
+        max_overflow=settings.sqlite_pool_size,
+    )
+    event.listen(sqlite_async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return sqlite_async_engine
 
-engine = create_engine(
-    sqlite_dsn,
-    connect_args={"check_same_thread": False},
-    pool_pre_ping=True,
-)
+
+engine = create_sqlite_engine(sqlite_dsn)
+async_engine = create_async_sqlite_engine(sqlite_async_dsn)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: 提交后仍可读取属性，避免异步上下文中的隐式懒加载
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
+@event.listens_for(Session, "before_commit")
+def _commit_started(session) -> None:
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session) -> None:
+    # 同步会话与 AsyncSession 底层的同步会话都会触发 (包含 flush 时间)
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        SQLITE_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
@@ -29,6 +114,23 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """获取异步数据库会话 (供 async def 端点使用)"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db() -> None:
-    """初始化数据库表"""
-    Base.metadata.create_all(bind=engine)
+    """初始化数据库表并执行迁移"""
+    from sqlalchemy.exc import OperationalError
+
+    from app.migrations import run_migrations
+
+    try:
+        Base.metadata.create_all(bind=engine)
+    except OperationalError as e:
+        # 多个 worker 同时建表时，其他进程可能已经创建，重新检查一次即可
+        if "already exists" not in str(e):
+            raise
+        Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
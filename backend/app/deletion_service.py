@@ -0,0 +1,123 @@
+"""
+项目删除服务
+删除请求只写入墓碑状态并立即返回，实际数据在后台按批删除，
+避免大项目一次性长事务阻塞其他读写
+"""
+import asyncio
+from pathlib import Path
+from typing import Set
+
+from sqlalchemy import delete, select
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ChatMessage, ChatSession, ChatSessionSummary, File, MessageSource, Project
+from app.vector_store import vector_store
+
+DELETING = "deleting"
+
+
+class DeletionService:
+    """后台分批删除项目数据"""
+
+    def __init__(self):
+        self.batch_size = settings.delete_batch_size
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _delete_in_batches(self, db, model, *conditions, key=None) -> int:
+        """按主键 (或指定的 key 列) 分批删除，每批单独提交，返回删除的 key 数"""
+        key = model.id if key is None else key
+        total = 0
+        while True:
+            ids = (await db.scalars(
+                select(key).where(*conditions).distinct().limit(self.batch_size)
+            )).all()
+            if not ids:
+                return total
+            await db.execute(delete(model).where(key.in_(ids)))
+            await db.commit()
+            total += len(ids)
+            # 让出事件循环，期间其他请求可以获取写锁
+            await asyncio.sleep(0)
+
+    def _remove_parsed_files(self, project_id: str, markdown_paths) -> int:
+        """删除解析产物 (记录中的路径 + Parsed/ 下以项目ID为前缀的文件)"""
+        parsed_dir = Path(settings.get_parsed_files_path())
+        paths = {Path(p) for p in markdown_paths if p}
+        paths.update(parsed_dir.glob(f"{project_id}_*"))
+
+        removed = 0
+        for path in paths:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to remove parsed file {path}: {e}")
+        return removed
+
+    async def purge(self, project_id: str) -> None:
+        """删除项目的全部数据 (可重复执行，中断后重跑会继续删除剩余部分)"""
+        await run_in_threadpool(vector_store.delete_collection, project_id)
+
+        async with AsyncSessionLocal() as db:
+            markdown_paths = (await db.scalars(
+                select(File.markdown_path).where(File.project_id == project_id)
+            )).all()
+
+            session_ids = select(ChatSession.id).where(ChatSession.project_id == project_id)
+            await db.execute(
+                delete(ChatSessionSummary).where(ChatSessionSummary.session_id.in_(session_ids))
+            )
+            await db.commit()
+
+            await self._delete_in_batches(
+                db, MessageSource, MessageSource.project_id == project_id,
+                key=MessageSource.message_id
+            )
+            messages = await self._delete_in_batches(
+                db, ChatMessage, ChatMessage.project_id == project_id
+            )
+            await self._delete_in_batches(db, ChatSession, ChatSession.project_id == project_id)
+            await self._delete_in_batches(db, File, File.project_id == project_id)
+
+            removed = await run_in_threadpool(self._remove_parsed_files, project_id, markdown_paths)
+
+            await db.execute(delete(Project).where(Project.id == project_id))
+            await db.commit()
+
+        print(f"Deleted project {project_id}: {messages} messages, {removed} parsed files")
+
+    def schedule(self, project_id: str) -> None:
+        """在后台执行删除 (同一项目不会重复执行)"""
+        if project_id in self._running:
+            return
+        self._running.add(project_id)
+
+        async def run() -> None:
+            try:
+                await self.purge(project_id)
+            except Exception as e:
+                print(f"Failed to delete project {project_id}: {e}")
+            finally:
+                self._running.discard(project_id)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def resume_pending(self) -> None:
+        """启动时继续执行上次未完成的删除"""
+        async with AsyncSessionLocal() as db:
+            project_ids = (await db.scalars(
+                select(Project.id).where(Project.status == DELETING)
+            )).all()
+        for project_id in project_ids:
+            self.schedule(project_id)
+
+
+# 全局实例
+deletion_service = DeletionService()
@@ -0,0 +1,122 @@
+"""
+嵌入向量缓存
+向量存放在 SQLite (WAL 下多进程并发读写安全)，多个 worker 共享，
+重复的查询与重新解析的文档不会再次调用嵌入 API
+"""
+import hashlib
+import threading
+from array import array
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import EmbeddingCacheEntry
+
+# 每写入多少条检查一次是否超出容量
+PRUNE_EVERY = 256
+
+
+class EmbeddingCache:
+    """SQLite 持久化的嵌入向量缓存"""
+
+    def __init__(self):
+        self.enabled = (
+            settings.embedding_cache_enabled
+            if settings.embedding_cache_enabled is not None
+            else settings.api_workers > 1
+        )
+        self.max_entries = settings.embedding_cache_max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """查询缓存，未命中返回 None"""
+        if not self.enabled:
+            return None
+        db = SessionLocal()
+        try:
+            blob = db.scalar(
+                select(EmbeddingCacheEntry.embedding)
+                .where(EmbeddingCacheEntry.key == self._key(model, text))
+            )
+        finally:
+            db.close()
+
+        if blob is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return array("f", blob).tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]) -> None:
+        """写入缓存 (已存在时覆盖)"""
+        if not self.enabled:
+            return
+        values = {
+            "key": self._key(model, text),
+            "model": model,
+            "dims": len(embedding),
+            "embedding": array("f", embedding).tobytes(),
+        }
+        # 单条 upsert 语句: 并发写入同一文本时不会出现先查后插的唯一键冲突
+        statement = insert(EmbeddingCacheEntry).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[EmbeddingCacheEntry.key],
+            set_={name: statement.excluded[name] for name in ("model", "dims", "embedding")}
+        )
+        db = SessionLocal()
+        try:
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % PRUNE_EVERY == 0
+        if should_prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """删除超出容量的最旧条目，返回删除数量"""
+        db = SessionLocal()
+        try:
+            total = db.scalar(select(func.count()).select_from(EmbeddingCacheEntry)) or 0
+            excess = total - self.max_entries
+            if excess <= 0:
+                return 0
+            oldest = (
+                select(EmbeddingCacheEntry.key)
+                .order_by(EmbeddingCacheEntry.created_at)
+                .limit(excess)
+            )
+            db.execute(
+                delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.key.in_(oldest))
+            )
+            db.commit()
+            return excess
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        """命中统计 (当前进程)"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+# 全局实例
+embedding_cache = EmbeddingCache()
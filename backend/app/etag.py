@@ -0,0 +1,39 @@
+"""
+弱 ETag 与条件请求
+ETag 由少量聚合值 (行数、最大更新时间等) 计算，命中 If-None-Match 时直接返回 304，
+不需要加载和序列化整个列表
+"""
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """根据变更标记计算弱 ETag"""
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中 (弱比较，忽略 W/ 前缀)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """304 响应 (无响应体)"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """为 200 响应设置 ETag，并要求客户端每次重新验证"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
@@ -0,0 +1,179 @@
+"""
+对话历史服务
+从 ChatMessage 组装多轮对话上下文，按 token 预算裁剪，
+超出预算的早期消息增量折叠进会话滚动摘要
+"""
+import asyncio
+from typing import Dict, List, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.llm_client import get_async_client, llm_stats
+from app.models import ChatMessage, ChatSessionSummary, beijing_now
+from app.tokenizer import count_tokens, truncate_to_tokens
+
+# 摘要时单条消息的 token 上限，避免超长回答撑爆摘要请求
+SUMMARY_INPUT_MESSAGE_TOKENS = 1000
+
+
+class HistoryService:
+    """多轮对话历史管理"""
+
+    def __init__(self):
+        self.token_budget = settings.history_token_budget
+        self.summary_max_tokens = settings.history_summary_max_tokens
+        self._updating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _unsummarized(self, db: AsyncSession, session_id: str, after_index: int):
+        """加载尚未折叠进摘要的消息 (只加载角色与正文)"""
+        result = await db.execute(
+            select(ChatMessage.message_index, ChatMessage.role, ChatMessage.content)
+            .where(
+                ChatMessage.session_id == session_id,
+                ChatMessage.message_index > after_index
+            )
+            .order_by(ChatMessage.message_index.asc())
+        )
+        return result.all()
+
+    async def build_history(self, db: AsyncSession, session_id: str) -> List[Dict]:
+        """
+        组装注入 LLM 的历史消息
+
+        Returns:
+            [
+                {"role": "system", "content": "此前对话摘要: ..."},  # 有摘要时
+                {"role": "user", "content": "..."},
+                {"role": "assistant", "content": "..."},
+                ...
+            ]
+        """
+        summary_row = await db.get(ChatSessionSummary, session_id)
+        summary = summary_row.summary if summary_row else ""
+        upto = summary_row.summarized_upto if summary_row else 0
+
+        budget = self.token_budget - count_tokens(summary)
+        picked = []
+        for row in reversed(await self._unsummarized(db, session_id, upto)):
+            tokens = count_tokens(row.content)
+            if tokens > budget:
+                break
+            budget -= tokens
+            picked.append({"role": row.role, "content": row.content})
+        picked.reverse()
+
+        # 历史必须以用户消息开头
+        while picked and picked[0]["role"] != "user":
+            picked.pop(0)
+
+        messages = []
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"此前对话摘要:\n{summary}"
+            })
+        messages.extend(picked)
+        return messages
+
+    async def _summarize(self, previous: str, rows) -> str:
+        """将新消息合并进已有摘要"""
+        turns = []
+        for row in rows:
+            speaker = "用户" if row.role == "user" else "助手"
+            content = truncate_to_tokens(row.content or "", SUMMARY_INPUT_MESSAGE_TOKENS)
+            turns.append(f"{speaker}: {content}")
+
+        prompt = f"""请更新以下对话摘要，将新的对话内容合并进去。
+保留用户关注的问题、已得到的结论、引用的论文与关键术语，省略寒暄与重复内容。
+摘要不超过 {self.summary_max_tokens} 个 token，直接输出摘要正文。
+
+已有摘要:
+{previous or "(无)"}
+
+新的对话:
+{chr(10).join(turns)}"""
+
+        timer = llm_stats.start("summary", settings.summary_model)
+        try:
+            response = await get_async_client().chat.completions.create(
+                model=settings.summary_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                max_tokens=self.summary_max_tokens
+            )
+        except Exception:
+            timer.finish(error=True)
+            raise
+        usage = getattr(response, "usage", None)
+        timer.finish(usage.completion_tokens if usage else 0)
+        summary = response.choices[0].message.content or ""
+        return truncate_to_tokens(summary.strip(), self.summary_max_tokens)
+
+    async def update_summary(self, db: AsyncSession, session_id: str) -> bool:
+        """
+        增量更新会话摘要
+
+        仅当未折叠的历史超出预算时触发，一次折叠最早的消息直到剩余部分
+        只占预算的一半，从而摊薄摘要调用的频率。
+
+        Returns:
+            是否更新了摘要
+        """
+        summary_row = await db.get(ChatSessionSummary, session_id)
+        previous = summary_row.summary if summary_row else ""
+        upto = summary_row.summarized_upto if summary_row else 0
+
+        rows = await self._unsummarized(db, session_id, upto)
+        tokens = [count_tokens(row.content) for row in rows]
+        remaining = sum(tokens)
+        if count_tokens(previous) + remaining <= self.token_budget:
+            return False
+
+        target = max(self.token_budget - self.summary_max_tokens, 0) // 2
+        fold = []
+        for row, row_tokens in zip(rows, tokens):
+            if remaining <= target:
+                break
+            fold.append(row)
+            remaining -= row_tokens
+        if not fold:
+            return False
+
+        summary = await self._summarize(previous, fold)
+
+        if not summary_row:
+            summary_row = ChatSessionSummary(session_id=session_id)
+            db.add(summary_row)
+        summary_row.summary = summary
+        summary_row.summarized_upto = fold[-1].message_index
+        summary_row.updated_at = beijing_now()
+        await db.commit()
+        return True
+
+    def schedule_summary_update(self, session_id: str) -> None:
+        """在后台更新摘要，不阻塞当前回答"""
+        if session_id in self._updating:
+            return
+
+        self._updating.add(session_id)
+
+        async def run() -> None:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.update_summary(db, session_id)
+            except Exception as e:
+                print(f"Failed to update summary for session {session_id}: {e}")
+            finally:
+                self._updating.discard(session_id)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# 全局实例
+history_service = HistoryService()
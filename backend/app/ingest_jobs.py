@@ -0,0 +1,314 @@
+"""
+解析任务协调
+多进程部署时各 worker 通过 SQLite 中文件记录上的租约协调解析任务:
+同一个文件同一时间只有一个 worker 在解析，持有者定期续约，
+worker 异常退出后租约过期，任务由扫描任务 (或再次上传) 重新领取并继续解析
+"""
+import asyncio
+import os
+import socket
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.deletion_service import DELETING
+from app.ingest_service import mineru_service
+from app.models import File, Project, beijing_now
+from app.project_transfer import IMPORTING
+from app.vector_store import vector_store
+
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class ProjectUnavailableError(Exception):
+    """解析期间项目被删除 (或处于导入中)"""
+
+
+class IngestCoordinator:
+    """基于文件记录租约的解析任务协调"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = settings.ingest_lease_seconds
+        self.max_attempts = settings.ingest_max_attempts
+        self.retry_failed = settings.ingest_retry_failed
+
+    def _lease_until(self):
+        return beijing_now() + timedelta(seconds=self.lease_seconds)
+
+    async def claim(self, db: AsyncSession, file_id: str, reset_attempts: bool = False) -> bool:
+        """
+        领取解析任务 (条件更新，多个 worker 竞争时只有一个成功)
+
+        可领取: 未开始 / 处理中但租约已过期 / 失败 (用户重新上传，reset_attempts=True；
+        或开启 ingest_retry_failed 且未超过重试次数)
+        """
+        now = beijing_now()
+        claimable = [
+            File.parse_status == "pending",
+            and_(
+                File.parse_status == PROCESSING,
+                or_(File.ingest_lease_until.is_(None), File.ingest_lease_until < now)
+            ),
+        ]
+        if reset_attempts:
+            claimable.append(File.parse_status == FAILED)
+        elif self.retry_failed:
+            claimable.append(
+                and_(File.parse_status == FAILED, func.coalesce(File.ingest_attempts, 0) < self.max_attempts)
+            )
+        result = await db.execute(
+            update(File)
+            .where(File.id == file_id, or_(*claimable))
+            .values(
+                parse_status=PROCESSING,
+                ingest_owner=self.worker_id,
+                ingest_lease_until=self._lease_until(),
+                ingest_attempts=1 if reset_attempts else func.coalesce(File.ingest_attempts, 0) + 1
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    async def acquire(
+        self,
+        db: AsyncSession,
+        project_id: str,
+        file_url: str,
+        file_name: str
+    ) -> Tuple[File, bool]:
+        """
+        为上传领取解析任务，返回 (文件记录, 是否由本 worker 解析)
+
+        同一文件之前解析失败时继续使用原记录；否则插入处理中的新记录。
+        (project_id, file_url) 在处理中状态下有部分唯一索引，插入冲突说明同一文件正在解析:
+        租约已过期则接管，否则返回该记录，由调用方等待其结果
+        """
+        while True:
+            failed = await db.scalar(
+                select(File)
+                .where(File.project_id == project_id, File.file_url == file_url, File.parse_status == FAILED)
+                .order_by(File.created_at.desc())
+                .limit(1)
+            )
+            if failed is not None and await self.claim(db, failed.id, reset_attempts=True):
+                await db.refresh(failed)
+                failed.file_name = file_name
+                await db.commit()
+                return failed, True
+
+            record = File(
+                project_id=project_id,
+                file_name=file_name,
+                file_url=file_url,
+                file_type="pdf",
+                parse_status=PROCESSING,
+                ingest_owner=self.worker_id,
+                ingest_lease_until=self._lease_until(),
+                ingest_attempts=1
+            )
+            db.add(record)
+            try:
+                await db.commit()
+                return record, True
+            except IntegrityError:
+                await db.rollback()
+
+            processing = and_(
+                File.project_id == project_id, File.file_url == file_url, File.parse_status == PROCESSING
+            )
+            active = await db.scalar(
+                select(File).where(processing, File.ingest_lease_until >= beijing_now()).limit(1)
+            )
+            if active is not None:
+                return active, False
+            # 租约已过期 (持有者退出)，接管；冲突的记录已结束或被他人接管时重新尝试
+            stale_id = await db.scalar(select(File.id).where(processing).limit(1))
+            if stale_id is not None and await self.claim(db, stale_id):
+                return await db.get(File, stale_id, populate_existing=True), True
+
+    async def wait_for(self, file_id: str, poll_interval: float = 1.0) -> Optional[File]:
+        """等待其他 worker 完成解析 (租约过期视为结束)，返回最终的文件记录"""
+        while True:
+            async with AsyncSessionLocal() as db:
+                still_running = await db.scalar(
+                    select(File.id).where(
+                        File.id == file_id,
+                        File.parse_status == PROCESSING,
+                        File.ingest_lease_until >= beijing_now()
+                    )
+                )
+                if not still_running:
+                    return await db.get(File, file_id)
+            await asyncio.sleep(poll_interval)
+
+    async def _renew(self, file_id: str) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(File)
+                .where(File.id == file_id, File.ingest_owner == self.worker_id)
+                .values(ingest_lease_until=self._lease_until())
+            )
+            await db.commit()
+
+    @asynccontextmanager
+    async def lease(self, file_id: str):
+        """持有租约期间在后台定期续约 (间隔为租约时长的三分之一)"""
+        async def heartbeat() -> None:
+            while True:
+                await asyncio.sleep(max(self.lease_seconds / 3, 1))
+                try:
+                    await self._renew(file_id)
+                except Exception as e:
+                    print(f"Failed to renew ingest lease for {file_id}: {e}")
+
+        task = asyncio.create_task(heartbeat())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def run(self, db: AsyncSession, file_record: File) -> Dict[str, Any]:
+        """
+        解析已领取的文件并更新记录与项目计数器，失败时标记为 failed 后重新抛出
+
+        向量ID由文件ID确定，中断后重新解析会覆盖之前写入的部分向量
+        """
+        try:
+            # 异步提交 MinerU 解析任务 (解析期间持续续约)
+            async with self.lease(file_record.id):
+                result = await mineru_service.ingest_pdf(
+                    file_url=file_record.file_url,
+                    project_id=file_record.project_id,
+                    file_name=file_record.file_name,
+                    file_id=file_record.id
+                )
+        except Exception:
+            file_record.parse_status = FAILED
+            file_record.ingest_lease_until = None
+            try:
+                await db.commit()
+            except StaleDataError:
+                # 记录已随项目一起删除
+                await db.rollback()
+            raise
+
+        file_record.mineru_task_id = result.get("task_id")
+        file_record.parse_status = COMPLETED
+        file_record.markdown_path = result.get("markdown_path")
+        file_record.chunks_count = result.get("chunks_count", 0)
+        file_record.parsed_at = beijing_now()
+        file_record.ingest_lease_until = None
+
+        # 更新项目计数器 (与文件状态同一事务，使用 SQL 自增避免并发覆盖)
+        updated = await db.execute(
+            update(Project)
+            .where(Project.id == file_record.project_id, Project.status.notin_((DELETING, IMPORTING)))
+            .values(
+                file_count=func.coalesce(Project.file_count, 0) + 1,
+                vector_count=func.coalesce(Project.vector_count, 0) + (file_record.chunks_count or 0),
+                last_active_at=beijing_now()
+            )
+        )
+        if updated.rowcount == 0:
+            # 解析期间项目被删除: 后台删除可能已经执行完，清理本次重新创建的向量集合与解析产物
+            project_id = file_record.project_id
+            await db.rollback()
+            await self._discard(project_id, result.get("markdown_path"))
+            raise ProjectUnavailableError(project_id)
+        await db.commit()
+        return result
+
+    @staticmethod
+    async def _discard(project_id: str, markdown_path: Optional[str]) -> None:
+        await run_in_threadpool(vector_store.delete_collection, project_id)
+        if markdown_path:
+            Path(markdown_path).unlink(missing_ok=True)
+
+    # ---------- 过期租约 / 失败任务扫描 ----------
+
+    async def _reclaimable(self, db: AsyncSession) -> List[str]:
+        """
+        可以重新领取的文件: 租约过期的处理中任务 (持有者已退出)；
+        开启 ingest_retry_failed 时还包括未超过重试次数的失败任务
+        """
+        now = beijing_now()
+        reclaimable = and_(
+            File.parse_status == PROCESSING,
+            or_(File.ingest_lease_until.is_(None), File.ingest_lease_until < now)
+        )
+        if self.retry_failed:
+            reclaimable = or_(
+                reclaimable,
+                and_(File.parse_status == FAILED, func.coalesce(File.ingest_attempts, 0) < self.max_attempts)
+            )
+        return list(await db.scalars(
+            select(File.id)
+            .join(Project, Project.id == File.project_id)
+            .where(Project.status.notin_((DELETING, IMPORTING)), reclaimable)
+            .order_by(File.created_at)
+        ))
+
+    async def _give_up_exhausted(self, db: AsyncSession) -> None:
+        """超过重试次数且租约已过期的处理中任务标记为失败 (释放去重索引)"""
+        await db.execute(
+            update(File)
+            .where(
+                File.parse_status == PROCESSING,
+                func.coalesce(File.ingest_attempts, 0) >= self.max_attempts,
+                or_(File.ingest_lease_until.is_(None), File.ingest_lease_until < beijing_now())
+            )
+            .values(parse_status=FAILED, ingest_lease_until=None)
+        )
+        await db.commit()
+
+    async def reap(self) -> int:
+        """
+        领取并继续中断的解析任务 (逐个执行)，返回领取的任务数
+
+        领取是条件更新，多个 worker 同时扫描也只有一个会执行同一任务
+        """
+        resumed = 0
+        async with AsyncSessionLocal() as db:
+            await self._give_up_exhausted(db)
+            file_ids = await self._reclaimable(db)
+
+        for file_id in file_ids:
+            async with AsyncSessionLocal() as db:
+                if not await self.claim(db, file_id):
+                    continue
+                file_record = await db.get(File, file_id)
+                resumed += 1
+                print(f"Resuming ingest of {file_record.file_name} ({file_id}), attempt {file_record.ingest_attempts}")
+                try:
+                    await self.run(db, file_record)
+                except Exception as e:
+                    print(f"Resumed ingest of {file_id} failed: {e}")
+        return resumed
+
+    async def run_reaper(self) -> None:
+        """启动时扫描一次，之后按 ingest_reaper_interval_seconds 周期扫描"""
+        interval = settings.ingest_reaper_interval_seconds
+        while True:
+            try:
+                await self.reap()
+            except Exception as e:
+                print(f"Ingest reaper failed: {e}")
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+
+# 全局实例
+ingest_coordinator = IngestCoordinator()
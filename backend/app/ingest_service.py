@@ -7,10 +7,12 @@ import time
 import re
 from typing import Dict, List, Optional
 from pathlib import Path
-import requests
 import httpx
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
+from app.metrics import INGEST_STAGE_SECONDS
+from app.tracing import span
 from app.vector_store import vector_store
 
 
@@ -213,7 +215,8 @@ class MinerUService:
         file_url: str,
         project_id: str,
         file_name: str,
-        save_markdown: bool = True
+        save_markdown: bool = True,
+        file_id: Optional[str] = None
     ) -> Dict:
         """
         完整的 PDF 摄取流程
@@ -223,6 +226,7 @@ class MinerUService:
             project_id: 项目ID
             file_name: 文件名
             save_markdown: 是否保存 Markdown 文件
+            file_id: 文件记录ID (用于生成不冲突的向量ID)
 
         Returns:
             {
@@ -233,11 +237,13 @@ class MinerUService:
             }
         """
         # 1. 提交解析任务
-        task_data = await self.extract_pdf(file_url)
+        with INGEST_STAGE_SECONDS.time(stage="submit"), span("ingest:submit", cat="ingest"):
+            task_data = await self.extract_pdf(file_url)
         task_id = task_data.get("task_id")
 
         # 2. 轮询等待完成
-        result = await self.poll_task_status(task_id)
+        with INGEST_STAGE_SECONDS.time(stage="poll"), span("ingest:poll", cat="ingest"):
+            result = await self.poll_task_status(task_id)
 
         # 3. 获取 Markdown 结果
         markdown = result.get("markdown", "")
@@ -245,12 +251,14 @@ class MinerUService:
             # 如果返回的是URL,需要下载
             result_url = result.get("result_url")
             if result_url:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(result_url)
-                    markdown = response.text
+                with INGEST_STAGE_SECONDS.time(stage="download"), span("ingest:download", cat="ingest"):
+                    async with httpx.AsyncClient() as client:
+                        response = await client.get(result_url)
+                        markdown = response.text
 
         # 4. 清洗数据
-        cleaned_markdown = self.clean_markdown(markdown)
+        with span("ingest:clean", cat="ingest", chars=len(markdown)):
+            cleaned_markdown = self.clean_markdown(markdown)
 
         # 5. 保存 Markdown 文件
         markdown_path = None
@@ -260,7 +268,8 @@ class MinerUService:
             markdown_path.write_text(cleaned_markdown, encoding="utf-8")
 
         # 6. 切片
-        chunks = self.chunk_by_section(cleaned_markdown)
+        with span("ingest:chunk", cat="ingest"):
+            chunks = self.chunk_by_section(cleaned_markdown)
 
         # 7. 准备元数据
         documents = [chunk["text"] for chunk in chunks]
@@ -277,11 +286,20 @@ class MinerUService:
         ]
 
         # 8. 向量化并存入 ChromaDB
-        vector_store.add_documents(
-            project_id=project_id,
-            documents=documents,
-            metadatas=metadatas
-        )
+        # 按文件生成ID: 基于集合现有数量的默认ID在并发解析同一项目时会冲突
+        ids = None
+        if file_id:
+            ids = [f"{project_id}_{file_id}_chunk_{i}" for i in range(len(documents))]
+        # 嵌入请求与缓存写入都是同步调用，放到线程池中执行，避免阻塞事件循环
+        # (阻塞期间其他请求的 aiosqlite 事务无法提交，会导致 database is locked)
+        with INGEST_STAGE_SECONDS.time(stage="embed"), span("ingest:embed", cat="ingest"):
+            await run_in_threadpool(
+                vector_store.add_documents,
+                project_id=project_id,
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
+            )
 
         return {
             "status": "success",
@@ -0,0 +1,194 @@
+"""
+OpenRouter 客户端工厂
+进程内共享 OpenAI 客户端 (连接池、超时、429/5xx 退避重试)，并记录每次调用的延迟指标
+"""
+import time
+from collections import deque
+from functools import lru_cache
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.metrics import LLM_REQUESTS, LLM_TOTAL_SECONDS, LLM_TTFT_SECONDS
+from app.tracing import tracer
+
+# openai / httpx 在首次创建客户端时才导入，缩短后端启动时间
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive_connections,
+        keepalive_expiry=settings.llm_keepalive_expiry
+    )
+
+
+def _timeout() -> "httpx.Timeout":
+    import httpx
+
+    # 读超时需要覆盖推理模型两次 token 之间的最长停顿
+    return httpx.Timeout(
+        connect=settings.llm_connect_timeout,
+        read=settings.llm_read_timeout,
+        write=settings.llm_write_timeout,
+        pool=settings.llm_pool_timeout
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_client() -> "AsyncOpenAI":
+    """
+    获取共享的异步客户端
+
+    SDK 对 408/409/429/5xx 与连接错误按指数退避 (带抖动) 自动重试，
+    重试次数由 llm_max_retries 控制。
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        base_url=settings.openrouter_base_url,
+        api_key=settings.openrouter_api_key,
+        max_retries=settings.llm_max_retries,
+        timeout=_timeout(),
+        http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+    )
+
+
+@lru_cache(maxsize=1)
+def get_sync_client() -> "OpenAI":
+    """获取共享的同步客户端 (嵌入向量等同步调用)"""
+    import httpx
+    from openai import OpenAI
+
+    return OpenAI(
+        base_url=settings.openrouter_base_url,
+        api_key=settings.openrouter_api_key,
+        max_retries=settings.llm_max_retries,
+        timeout=_timeout(),
+        http_client=httpx.Client(limits=_limits(), timeout=_timeout())
+    )
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class CompletionTimer:
+    """
+    单次调用计时
+
+    用法:
+        timer = llm_stats.start("chat", model)
+        ... 收到首个 token 时 timer.first_token()
+        ... 结束时 timer.finish(output_tokens)
+    """
+
+    def __init__(self, stats: "LLMStats", kind: str, model: str):
+        self.stats = stats
+        self.kind = kind
+        self.model = model
+        self.started_at = time.perf_counter()
+        self.started_us = time.time_ns() // 1000
+        self.ttft: Optional[float] = None
+        self.finished = False
+
+    def first_token(self) -> None:
+        """记录首 token 时间 (仅第一次调用生效)"""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started_at
+
+    def finish(self, output_tokens: int = 0, error: bool = False) -> None:
+        """记录调用结束"""
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.started_at
+        self.stats.record(self.kind, self.model, total, self.ttft, output_tokens, error)
+        tracer.record(
+            f"llm:{self.kind}", self.started_us, int(total * 1_000_000), cat="llm",
+            model=self.model,
+            ttft_ms=round(self.ttft * 1000, 1) if self.ttft is not None else None,
+            output_tokens=output_tokens,
+            error=error
+        )
+
+        # 嵌入调用另有 papermem_embedding_* 指标
+        if self.kind != "embedding":
+            LLM_REQUESTS.inc(kind=self.kind, status="error" if error else "ok")
+            if not error:
+                LLM_TOTAL_SECONDS.observe(total, kind=self.kind, model=self.model)
+                if self.ttft is not None:
+                    LLM_TTFT_SECONDS.observe(self.ttft, kind=self.kind, model=self.model)
+
+
+class LLMStats:
+    """最近 N 次调用的延迟与吞吐统计"""
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window or settings.llm_stats_window
+        self._samples: Dict[Tuple[str, str], Deque[Dict]] = {}
+        self._totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def start(self, kind: str, model: str) -> CompletionTimer:
+        """开始计时"""
+        return CompletionTimer(self, kind, model)
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        total: float,
+        ttft: Optional[float] = None,
+        output_tokens: int = 0,
+        error: bool = False
+    ) -> None:
+        """记录一次调用"""
+        key = (kind, model)
+        samples = self._samples.setdefault(key, deque(maxlen=self.window))
+        totals = self._totals.setdefault(key, {"count": 0, "errors": 0, "output_tokens": 0})
+        totals["count"] += 1
+        totals["errors"] += int(error)
+        totals["output_tokens"] += output_tokens
+        if error:
+            return
+
+        # 生成速度按首 token 之后的时间计算
+        generation_time = total - (ttft or 0)
+        samples.append({
+            "total": total,
+            "ttft": ttft,
+            "tps": output_tokens / generation_time if output_tokens and generation_time > 0 else None
+        })
+
+    def summary(self) -> List[Dict]:
+        """按 (kind, model) 汇总"""
+        result = []
+        for (kind, model), samples in self._samples.items():
+            totals = [s["total"] for s in samples]
+            ttfts = [s["ttft"] for s in samples if s["ttft"] is not None]
+            tps = [s["tps"] for s in samples if s["tps"] is not None]
+            result.append({
+                "kind": kind,
+                "model": model,
+                **self._totals[(kind, model)],
+                "window": len(samples),
+                "total_latency_p50": _percentile(totals, 50),
+                "total_latency_p95": _percentile(totals, 95),
+                "ttft_p50": _percentile(ttfts, 50),
+                "ttft_p95": _percentile(ttfts, 95),
+                "tokens_per_second_avg": sum(tps) / len(tps) if tps else None
+            })
+        return result
+
+
+# 全局实例
+llm_stats = LLMStats()
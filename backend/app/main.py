@@ -2,34 +2,60 @@
 PaperMem FastAPI 后端服务
 """
 import os
-import json
-from typing import Any, AsyncGenerator, Dict, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 # 禁用 ChromaDB telemetry（必须在导入 chromadb 之前）
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
-from fastapi import Depends, FastAPI, HTTPException, UploadFile, File as FastAPIFile
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, UploadFile, File as FastAPIFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
 
 from app.config import settings
-from app.database import get_db, init_db
+from app.compression import CompressionMiddleware
+from app.tracing import TracingMiddleware, span
+from app.database import AsyncSessionLocal, get_async_db, get_db, init_db
 from app.models import ChatMessage, ChatSession, Project, File, beijing_now
+from app.chat_modes import is_valid_mode
 from app.chat_service import chat_service
-from app.ingest_service import mineru_service
+from app.deletion_service import DELETING, deletion_service
+from app.answer_cache import answer_cache
+from app.embedding_cache import embedding_cache
+from app.cursor import decode_cursor, encode_cursor
+from app.etag import etag_matches, make_etag, not_modified, set_etag
+from app.history_service import history_service
+from app.llm_client import llm_stats
+from app.message_search import message_search
+from app.project_transfer import IMPORTING, ProjectConflictError, ProjectImporter, project_exporter
+from app.metrics import CHAT_STAGE_SECONDS, SSE_EVENTS_PER_STREAM, SSE_STREAMS, registry
+from app.sources import build_sources, group_sources, hydrate_sources, sources_query
+from app.scheduler import CHAT, SEARCH, QueueFullError, scheduler
+from app.stats_service import stats_service
+from app.ingest_jobs import ProjectUnavailableError, ingest_coordinator
 from app.vector_store import vector_store
+from app.streaming import EventCoalescer, stream_registry
 from app.schemas import (
     ChatSessionCreate,
     ChatSessionRead,
+    ChatMessageListItem,
     ChatMessageRead,
+    MessageSearchResults,
     ProjectCreate,
     ProjectRead,
+    ProjectSummary,
     FileResponse,
 )
 
+# 删除中 / 导入中的项目对外视为不存在，不接受写入
+UNAVAILABLE_STATUSES = (DELETING, IMPORTING)
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title=settings.app_name,
@@ -44,13 +70,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-Id", "ETag", "X-Trace-Id", "X-Next-Cursor"],
 )
 
+# 响应压缩 (只压缩超过阈值的完整响应，SSE 等流式响应不压缩)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.response_compression_min_size)
+
+# 请求追踪 (TRACING_ENABLED=true 时写入 Chrome Trace 文件)
+app.add_middleware(TracingMiddleware)
+
 
 @app.on_event("startup")
 def on_startup() -> None:
     """启动时初始化数据库"""
     init_db()
+    app.state.db_ready = True
+    chroma_location = (
+        f"http://{settings.chroma_server_host}:{settings.chroma_server_port}"
+        if settings.chroma_server_host else settings.get_chroma_path()
+    )
     print(f"""
     ╔══════════════════════════════════════╗
     ║   PaperMem Backend Server Started    ║
@@ -59,10 +97,44 @@ def on_startup() -> None:
     ╚══════════════════════════════════════╝
 
     SQLite DB: {settings.get_sqlite_path()}
-    ChromaDB: {settings.get_chroma_path()}
+    ChromaDB: {chroma_location}
+    Worker: {ingest_coordinator.worker_id}
     """)
 
 
+@app.on_event("startup")
+async def warm_up_vector_store() -> None:
+    """后台预热 ChromaDB 客户端，不阻塞服务启动 (就绪状态见 /ready)"""
+    async def warm_up() -> None:
+        try:
+            seconds = await run_in_threadpool(vector_store.warm_up)
+            print(f"Vector store ready in {seconds:.2f}s")
+        except Exception as e:
+            app.state.warmup_error = str(e)
+            print(f"Vector store warm-up failed: {e}")
+
+    app.state.warmup_error = None
+    app.state.warmup_task = asyncio.create_task(warm_up())
+
+
+@app.on_event("startup")
+async def resume_deletions() -> None:
+    """继续执行上次退出前未完成的项目删除"""
+    await deletion_service.resume_pending()
+
+
+@app.on_event("startup")
+async def start_ingest_reaper() -> None:
+    """后台领取并继续中断 (租约过期) 或失败的解析任务"""
+    app.state.ingest_reaper_task = asyncio.create_task(ingest_coordinator.run_reaper())
+
+
+@app.on_event("startup")
+async def start_stats_reconciliation() -> None:
+    """后台定时校准项目统计计数器"""
+    app.state.stats_task = asyncio.create_task(stats_service.run_periodic())
+
+
 # ==================== 健康检查 ====================
 
 @app.get("/health")
@@ -75,12 +147,124 @@ def health() -> Dict[str, str]:
     }
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """
+    就绪检查端点
+
+    /health 只表示进程已启动；/ready 在数据库初始化和 ChromaDB 预热完成后才返回 200，
+    之前返回 503 (客户端可轮询等待)
+    """
+    checks = {
+        "database": bool(getattr(app.state, "db_ready", False)),
+        "vector_store": vector_store.ready,
+    }
+    body: Dict[str, Any] = {
+        "status": "ready" if all(checks.values()) else "starting",
+        "checks": checks,
+        "warmup_seconds": vector_store.warmup_seconds,
+    }
+    error = getattr(app.state, "warmup_error", None)
+    if error:
+        body["status"] = "error"
+        body["error"] = error
+    return JSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus 文本格式指标 (各阶段延迟直方图与计数器)"""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/stats")
+def service_stats() -> Dict[str, Any]:
+    """服务运行统计: LLM 调用延迟 (TTFT / 吞吐 / 总耗时)、调度器、答案缓存"""
+    return {
+        "llm": llm_stats.summary(),
+        "scheduler": scheduler.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "embedding_cache": embedding_cache.get_stats(),
+        "worker": ingest_coordinator.worker_id
+    }
+
+
 # ==================== 项目管理 ====================
 
-@app.get("/projects", response_model=List[ProjectRead])
-def list_projects(db: Session = Depends(get_db)):
-    """获取所有项目列表"""
-    return db.query(Project).order_by(Project.created_at.desc()).all()
+# view=summary 时只读取的列
+PROJECT_SUMMARY_COLUMNS = (
+    Project.id, Project.name, Project.message_count, Project.file_count,
+    Project.vector_count, Project.last_active_at
+)
+
+
+@app.get("/projects", response_model=List[ProjectRead], response_class=ORJSONResponse)
+def list_projects(
+    response: Response,
+    status: Optional[str] = Query(None, description="只返回该状态的项目"),
+    project_type: Optional[str] = Query(None, alias="type", description="只返回该类型的项目"),
+    view: str = Query("full", pattern="^(full|summary)$", description="summary: 只返回 ID、名称、计数器与最近活跃时间"),
+    sort: str = Query("created", pattern="^(created|active)$", description="created: 按创建时间; active: 按最近活跃时间"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量 (不传时返回全部)"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    获取项目列表 (按时间倒序，支持 If-None-Match，未变化时返回 304)
+
+    传入 limit 时按 (时间, ID) keyset 分页，还有下一页时通过响应头 X-Next-Cursor 返回游标；
+    响应体仍是项目数组，不传分页参数时与旧版行为一致
+    """
+    sort_column = Project.last_active_at if sort == "active" else Project.created_at
+    conditions = [Project.status.notin_(UNAVAILABLE_STATUSES)]
+    if status:
+        conditions.append(Project.status == status)
+    if project_type:
+        conditions.append(Project.type == project_type)
+
+    count, updated, active = db.query(
+        func.count(Project.id), func.max(Project.updated_at), func.max(Project.last_active_at)
+    ).filter(*conditions).one()
+    etag = make_etag("projects", status, project_type, view, sort, limit, cursor, count, updated, active)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        conditions.append(tuple_(sort_column, Project.id) < tuple_(*after))
+
+    columns = (PROJECT_SUMMARY_COLUMNS + (sort_column,)) if view == "summary" else (Project,)
+    query = (
+        db.query(*columns)
+        .filter(*conditions)
+        .order_by(sort_column.desc(), Project.id.desc())
+    )
+    rows = query.limit(limit + 1).all() if limit else query.all()
+
+    headers = {}
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(
+            last.last_active_at if sort == "active" else last.created_at, last.id
+        )
+
+    if view == "summary":
+        # 精简投影直接序列化，跳过 response_model (ProjectRead) 校验
+        response = ORJSONResponse(
+            [ProjectSummary.model_validate(row).model_dump(mode="json") for row in rows],
+            headers=headers
+        )
+        set_etag(response, etag)
+        return response
+
+    set_etag(response, etag)
+    response.headers.update(headers)
+    return rows
 
 
 @app.post("/projects", response_model=ProjectRead)
@@ -98,28 +282,94 @@ def create_project(payload: ProjectCreate, db: Session = Depends(get_db)):
 
 
 @app.delete("/projects/{project_id}")
-def delete_project(project_id: str, db: Session = Depends(get_db)) -> Dict[str, bool]:
-    """删除项目及其所有数据"""
-    # 删除向量数据
-    vector_store.delete_collection(project_id)
+async def delete_project(
+    project_id: str,
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
+    """
+    删除项目及其所有数据
 
-    # 删除数据库记录
-    db.query(ChatMessage).filter(ChatMessage.project_id == project_id).delete()
-    db.query(ChatSession).filter(ChatSession.project_id == project_id).delete()
-    db.query(File).filter(File.project_id == project_id).delete()
-    deleted = db.query(Project).filter(Project.id == project_id).delete()
+    只标记为删除中并立即返回，向量、消息、文件记录与解析产物由后台分批删除
+    """
+    project = await db.get(Project, project_id)
+    if not project:
+        return {"ok": False}
 
-    db.commit()
-    return {"ok": deleted > 0}
+    if project.status != DELETING:
+        project.status = DELETING
+        await db.commit()
+
+    deletion_service.schedule(project_id)
+    return {"ok": True, "status": DELETING}
 
 
 @app.get("/projects/{project_id}", response_model=ProjectRead)
 def get_project(project_id: str, db: Session = Depends(get_db)):
     """获取项目详情"""
+    return require_available_project(db, project_id)
+
+
+@app.get("/projects/{project_id}/export")
+def export_project(
+    project_id: str,
+    vectors: str = Query("f32", pattern="^(f32|json)$", description="向量编码: f32 (base64 float32) 或 json"),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    导出项目为 NDJSON 流 (SQLite 行 + 解析产物 + ChromaDB 向量与原文)
+
+    边读边写，内存占用与项目大小无关；导出文件可通过 POST /projects/import 恢复
+    """
     project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+    if not project or project.status in UNAVAILABLE_STATUSES:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+
+    return StreamingResponse(
+        project_exporter.iter_ndjson(project_id, vectors=vectors),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="papermem-{project_id}.ndjson"'}
+    )
+
+
+@app.post("/projects/import")
+async def import_project(
+    request: Request,
+    new_id: bool = Query(False, description="以新ID导入 (可在同一数据库中复制项目)")
+) -> Dict[str, Any]:
+    """
+    从导出的 NDJSON 恢复项目 (请求体按块流式读取)
+
+    向量直接写回 ChromaDB，不重新调用嵌入 API。导入失败时已写入的部分由后台删除。
+
+    Returns:
+        {"project_id": "...", "counts": {"project": 1, "file": 3, ..., "vector": 120}}
+    """
+    importer = ProjectImporter(new_id=new_id)
+    try:
+        result = await importer.import_stream(request.stream())
+    except Exception as e:
+        await run_in_threadpool(importer.close)
+        if importer.created_project_id:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Project)
+                    .where(Project.id == importer.created_project_id)
+                    .values(status=DELETING)
+                )
+                await db.commit()
+            deletion_service.schedule(importer.created_project_id)
+        if isinstance(e, ProjectConflictError):
+            raise HTTPException(status_code=409, detail=str(e))
+        if isinstance(e, IntegrityError):
+            raise HTTPException(status_code=409, detail=f"Import conflicts with existing data: {e.orig}")
+        if isinstance(e, (ValueError, KeyError, TypeError)):
+            raise HTTPException(status_code=400, detail=f"Invalid project export: {e}")
+        raise
+    await run_in_threadpool(importer.close)
+
+    # 导入的计数器按实际数据校准一次 (向量数以 ChromaDB 为准)
+    await run_in_threadpool(stats_service.reconcile, result["project_id"])
+    return result
 
 
 # ==================== 文件管理 ====================
@@ -129,7 +379,7 @@ async def upload_file(
     project_id: str,
     file_url: str,
     file_name: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """
     上传并解析文件 (MinIO URL)
@@ -146,58 +396,61 @@ async def upload_file(
             "task_id": "..."
         }
     """
-    # 创建文件记录
-    file_record = File(
-        project_id=project_id,
-        file_name=file_name,
-        file_url=file_url,
-        file_type="pdf",
-        parse_status="pending"
-    )
-    db.add(file_record)
-    db.commit()
-    db.refresh(file_record)
+    # 与领取在同一事务中确认项目可写 (删除中的项目不能重新创建向量集合)
+    await lock_writable_project(db, project_id)
+
+    # 领取解析任务: 同一文件正由其他请求 / worker 解析时等待其结果，避免重复解析
+    while True:
+        file_record, claimed = await ingest_coordinator.acquire(db, project_id, file_url, file_name)
+        if claimed:
+            break
+        record = await ingest_coordinator.wait_for(file_record.id)
+        if record and record.parse_status == "completed":
+            return {
+                "file_id": record.id,
+                "status": "completed",
+                "task_id": record.mineru_task_id,
+                "chunks_count": record.chunks_count
+            }
+        # 其他 worker 解析失败或租约过期: 重新领取
 
     try:
-        # 异步提交 MinerU 解析任务
-        result = await mineru_service.ingest_pdf(
-            file_url=file_url,
-            project_id=project_id,
-            file_name=file_name
-        )
-
-        # 更新文件记录
-        file_record.mineru_task_id = result.get("task_id")
-        file_record.parse_status = "completed"
-        file_record.markdown_path = result.get("markdown_path")
-        file_record.chunks_count = result.get("chunks_count", 0)
-        file_record.parsed_at = beijing_now()
-
-        # 更新项目文件计数
-        project = db.query(Project).filter(Project.id == project_id).first()
-        if project:
-            project.file_count = (project.file_count or 0) + 1
-            project.last_active_at = beijing_now()
-
-        db.commit()
-
-        return {
-            "file_id": file_record.id,
-            "status": "completed",
-            "task_id": result.get("task_id"),
-            "chunks_count": result.get("chunks_count")
-        }
-
+        result = await ingest_coordinator.run(db, file_record)
+    except ProjectUnavailableError:
+        raise HTTPException(status_code=404, detail="Project not found")
     except Exception as e:
-        file_record.parse_status = "failed"
-        db.commit()
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
 
+    return {
+        "file_id": file_record.id,
+        "status": "completed",
+        "task_id": result.get("task_id"),
+        "chunks_count": result.get("chunks_count")
+    }
+
 
-@app.get("/projects/{project_id}/files", response_model=List[FileResponse])
-def list_files(project_id: str, db: Session = Depends(get_db)):
-    """获取项目所有文件"""
-    return db.query(File).filter(File.project_id == project_id).all()
+@app.get("/projects/{project_id}/files", response_model=List[FileResponse], response_class=ORJSONResponse)
+def list_files(
+    project_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """获取项目所有文件 (支持 If-None-Match，未变化时返回 304)"""
+    count, updated = db.query(
+        func.count(File.id), func.max(File.updated_at)
+    ).filter(File.project_id == project_id).one()
+    etag = make_etag("files", project_id, count, updated)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+    return (
+        db.query(File)
+        .filter(File.project_id == project_id)
+        .order_by(File.created_at.asc())
+        .all()
+    )
 
 
 # ==================== 对话会话管理 ====================
@@ -208,6 +461,7 @@ def create_chat_session(
     db: Session = Depends(get_db)
 ):
     """创建新对话会话"""
+    require_available_project(db, payload.project_id)
     session = ChatSession(
         project_id=payload.project_id,
         title=payload.title
@@ -218,6 +472,31 @@ def create_chat_session(
     return session
 
 
+def require_available_project(db: Session, project_id: str) -> Project:
+    """项目不存在、删除中或导入中时返回 404"""
+    project = db.get(Project, project_id)
+    if not project or project.status in UNAVAILABLE_STATUSES:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+
+async def lock_writable_project(db: AsyncSession, project_id: str) -> None:
+    """
+    在当前事务中确认项目可写，否则回滚并返回 404
+
+    以条件 UPDATE 开启写事务: 标记删除的事务要么先提交 (本次写入被拒绝)，
+    要么在本事务提交之后才能执行 (之后的后台删除会一并清理本次写入)
+    """
+    result = await db.execute(
+        update(Project)
+        .where(Project.id == project_id, Project.status.notin_(UNAVAILABLE_STATUSES))
+        .values(last_active_at=beijing_now())
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Project not found")
+
+
 def get_or_create_current_session(db: Session, project_id: str):
     """获取或创建当前会话"""
     session = (
@@ -239,21 +518,43 @@ def get_or_create_current_session(db: Session, project_id: str):
     return session
 
 
-def save_message(
-    db: Session,
+async def get_or_create_current_session_async(db: AsyncSession, project_id: str) -> ChatSession:
+    """获取或创建当前会话 (异步)"""
+    session = await db.scalar(
+        select(ChatSession)
+        .where(
+            ChatSession.project_id == project_id,
+            ChatSession.is_current.is_(True)
+        )
+        .order_by(ChatSession.created_at.desc())
+        .limit(1)
+    )
+    if session:
+        return session
+
+    await lock_writable_project(db, project_id)
+    session = ChatSession(project_id=project_id, title="Main")
+    db.add(session)
+    await db.commit()
+    return session
+
+
+async def save_message(
+    db: AsyncSession,
     project_id: str,
     session_id: str,
     role: str,
     content: str,
     reasoning_trace: Optional[str] = None,
-    search_results: Optional[str] = None,
+    contexts: Optional[List[Dict]] = None,
 ):
-    """保存对话消息"""
-    message_count = (
-        db.query(func.count(ChatMessage.id))
-        .filter(ChatMessage.session_id == session_id)
-        .scalar() or 0
-    )
+    """保存对话消息 (contexts 为检索上下文，写入 message_sources)"""
+    # 生成期间项目可能被删除，写入前在同一事务中确认
+    await lock_writable_project(db, project_id)
+    message_count = await db.scalar(
+        select(func.count(ChatMessage.id))
+        .where(ChatMessage.session_id == session_id)
+    ) or 0
 
     message = ChatMessage(
         session_id=session_id,
@@ -261,44 +562,121 @@ def save_message(
         role=role,
         content=content,
         reasoning_trace=reasoning_trace,
-        search_results=search_results,
         has_thinking=bool(reasoning_trace),
         message_index=message_count + 1,
     )
     db.add(message)
+    if contexts:
+        # flush 生成消息ID后写入来源行 (与消息同一事务)
+        await db.flush()
+        db.add_all(build_sources(message.id, project_id, contexts))
 
     # 更新会话
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    session = await db.get(ChatSession, session_id)
     if session:
         session.message_count = message_count + 1
         session.last_message_at = beijing_now()
 
-    # 更新项目
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if project:
-        project.message_count = (project.message_count or 0) + 1
-        project.last_message_preview = (content or "")[:200]
-        project.last_active_at = beijing_now()
+    # 更新项目 (SQL 自增，并发写入时计数不丢失)
+    await db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(
+            message_count=func.coalesce(Project.message_count, 0) + 1,
+            last_message_preview=(content or "")[:200],
+            last_active_at=beijing_now()
+        )
+    )
 
-    db.commit()
-    db.refresh(message)
+    await db.commit()
     return message
 
 
-@app.get("/projects/{project_id}/messages", response_model=List[ChatMessageRead])
+@app.get("/projects/{project_id}/messages", response_model=List[ChatMessageListItem], response_class=ORJSONResponse)
 def get_project_messages(
     project_id: str,
+    response: Response,
+    before: Optional[int] = Query(None, description="返回 message_index 小于该值的消息"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量 (不传时返回全部)"),
+    include_sources: bool = Query(False, description="是否附带检索来源 (块ID、排名、距离)"),
     db: Session = Depends(get_db)
-) -> List[ChatMessage]:
-    """获取项目消息历史"""
+) -> List[ChatMessageListItem]:
+    """
+    获取项目消息历史 (按 message_index 升序)
+
+    传入 limit 时从最新消息向前翻页，还有更早的消息时通过响应头 X-Next-Cursor 返回游标 (传给 before)；
+    响应体仍是消息数组，不传分页参数时与旧版行为一致。
+    列表不加载 reasoning_trace，需要时通过 /projects/{project_id}/messages/{message_id} 获取。
+    include_sources=true 时用一次查询批量读取本页消息的来源。
+    """
+    require_available_project(db, project_id)
     session = get_or_create_current_session(db, project_id)
-    messages = (
+    query = (
         db.query(ChatMessage)
+        .options(defer(ChatMessage.reasoning_trace))
         .filter(ChatMessage.session_id == session.id)
-        .order_by(ChatMessage.message_index.asc())
-        .all()
     )
-    return messages
+    if before is not None:
+        query = query.filter(ChatMessage.message_index < before)
+
+    query = query.order_by(ChatMessage.message_index.desc())
+    rows = query.limit(limit + 1).all() if limit else query.all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].message_index)
+    rows.reverse()
+
+    items = [ChatMessageListItem.model_validate(row) for row in rows]
+    if include_sources and items:
+        grouped = group_sources(db.execute(sources_query(project_id, [item.id for item in items])))
+        for item in items:
+            item.sources = grouped.get(item.id, [])
+    return items
+
+
+@app.get("/projects/{project_id}/messages/search", response_model=MessageSearchResults, response_class=ORJSONResponse)
+def search_project_messages(
+    project_id: str,
+    q: str = Query(..., min_length=1, max_length=200, description="检索词 (空格分隔的多个词需同时命中)"),
+    session_id: Optional[str] = Query(None, description="只检索指定会话"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    全文检索项目的对话历史 (跨所有会话，按相关度排序，返回命中片段)
+
+    走 SQLite FTS5 索引，不调用嵌入 API；需要完整内容时通过消息详情接口获取。
+    """
+    return {
+        "query": q,
+        "items": message_search.search(db, project_id, q, limit=limit, session_id=session_id)
+    }
+
+
+@app.get("/projects/{project_id}/messages/{message_id}", response_model=ChatMessageRead, response_class=ORJSONResponse)
+def get_project_message(
+    project_id: str,
+    message_id: str,
+    hydrate: bool = Query(False, description="是否从向量库取回检索来源原文"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取单条消息详情 (含思维链与检索来源)
+
+    sources 来自 message_sources (块ID、排名、距离)，hydrate=true 时从向量库补充原文与元数据
+    """
+    message = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.id == message_id, ChatMessage.project_id == project_id)
+        .first()
+    )
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    detail = ChatMessageRead.model_validate(message)
+    sources = group_sources(db.execute(sources_query(project_id, [message_id]))).get(message_id, [])
+    detail.sources = hydrate_sources(project_id, sources) if hydrate else sources
+    return detail
 
 
 # ==================== RAG 对话 ====================
@@ -306,7 +684,7 @@ def get_project_messages(
 @app.post("/chat/stream")
 async def chat_stream_endpoint(
     payload: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> StreamingResponse:
     """
     流式 RAG 对话
@@ -315,116 +693,231 @@ async def chat_stream_endpoint(
         {
             "query": "用户问题",
             "project_id": "项目ID",
-            "top_k": 5  # 可选
+            "top_k": 5,  # 可选, 默认取模式配置
+            "use_cache": true,  # 可选, 默认取配置 ANSWER_CACHE_ENABLED
+            "mode": "auto"  # 可选, fast / standard / deep / auto
         }
 
-    Response: SSE 流
+    Response: SSE 流 (每帧带递增的 id, 响应头 X-Stream-Id 为流 ID)
+        - type: "stream" - 流 ID，用于断线续传
+        - type: "queue" - 排队位置 (并发已满时)
+        - type: "mode" - 实际使用的模式与模型
         - type: "search" - 检索结果
         - type: "reasoning" - 思考过程
         - type: "content_chunk" - 回复内容片段
         - type: "done" - 完成
+
+    断线后使用 GET /chat/stream/{stream_id} 并携带 Last-Event-ID 续传。
     """
     query = payload.get("query")
     project_id = payload.get("project_id")
-    top_k = payload.get("top_k", 5)
+    top_k = payload.get("top_k")
+    use_cache = payload.get("use_cache")
+    mode = payload.get("mode")
 
     if not query or not project_id:
         raise HTTPException(
             status_code=400,
             detail="query 和 project_id 为必填参数"
         )
+    if not is_valid_mode(mode):
+        raise HTTPException(status_code=400, detail=f"Unknown chat mode: {mode}")
 
-    session = get_or_create_current_session(db, project_id)
+    project = await db.get(Project, project_id)
+    if not project or project.status in UNAVAILABLE_STATUSES:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    session = await get_or_create_current_session_async(db, project_id)
+    session_id = session.id
+    with span("history", cat="chat"):
+        history = await history_service.build_history(db, session_id)
 
-    async def event_stream() -> AsyncGenerator[str, None]:
-        full_content = ""
-        full_reasoning = ""
+    try:
+        ticket = scheduler.enqueue(project_id, CHAT)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    buffer = stream_registry.create()
+
+    async def generate() -> None:
+        """生成任务独立于客户端连接运行，断线不会中断生成与保存"""
+        content_parts: List[str] = []
+        reasoning_parts: List[str] = []
+        full_content = None
+        full_reasoning = None
         contexts = []
+        status = "ok"
 
         try:
-            async for event in chat_service.chat_stream(
+            await buffer.append({"type": "stream", "stream_id": buffer.stream_id})
+
+            with span("queue_wait", cat="chat"):
+                async for position in ticket.wait():
+                    await buffer.append({
+                        "type": "queue",
+                        "position": position,
+                        "content": f"排队中，前方还有 {position - 1} 个请求"
+                    })
+
+            events = chat_service.chat_stream(
                 project_id=project_id,
                 query=query,
-                top_k=top_k
-            ):
+                top_k=top_k,
+                messages_history=history,
+                use_cache=use_cache,
+                mode=mode
+            )
+            async for event in EventCoalescer().coalesce(events):
                 if event["type"] == "search":
                     contexts = event.get("contexts", [])
                 elif event["type"] == "content_chunk":
-                    full_content += event["content"]
+                    content_parts.append(event["content"])
                 elif event["type"] == "reasoning":
-                    full_reasoning += event["content"]
+                    reasoning_parts.append(event["content"])
                 elif event["type"] == "done":
-                    full_content = event.get("full_content", full_content)
-                    full_reasoning = event.get("reasoning_trace", full_reasoning)
+                    full_content = event.get("full_content")
+                    full_reasoning = event.get("reasoning_trace")
+
+                await buffer.append(event)
 
-                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if full_content is None:
+                full_content = "".join(content_parts)
+            if full_reasoning is None:
+                full_reasoning = "".join(reasoning_parts)
 
-            # 保存消息
+            # 保存消息 (请求级会话可能已随连接关闭，使用独立会话)
             if full_content:
-                save_message(db, project_id, session.id, "user", query)
-                save_message(
-                    db,
-                    project_id,
-                    session.id,
-                    "assistant",
-                    full_content,
-                    reasoning_trace=full_reasoning,
-                    search_results=json.dumps(contexts, ensure_ascii=False)
-                )
+                with CHAT_STAGE_SECONDS.time(stage="persist"), span("persist", cat="chat"):
+                    async with AsyncSessionLocal() as task_db:
+                        await save_message(task_db, project_id, session_id, "user", query)
+                        await save_message(
+                            task_db,
+                            project_id,
+                            session_id,
+                            "assistant",
+                            full_content,
+                            reasoning_trace=full_reasoning,
+                            contexts=contexts
+                        )
+                history_service.schedule_summary_update(session_id)
 
         except Exception as e:
-            error_event = {
+            status = "error"
+            await buffer.append({
                 "type": "error",
                 "content": str(e)
-            }
-            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+            })
+        finally:
+            ticket.release()
+            await buffer.close()
+            SSE_STREAMS.inc(status=status)
+            SSE_EVENTS_PER_STREAM.observe(buffer.next_seq - 1)
+
+    buffer.task = asyncio.create_task(generate())
+
+    return StreamingResponse(
+        buffer.subscribe(),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": buffer.stream_id}
+    )
 
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/chat/stream/{stream_id}")
+async def resume_chat_stream(
+    stream_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+) -> StreamingResponse:
+    """
+    断线续传
+
+    重放 Last-Event-ID 之后缓冲的事件并继续接收实时事件，不会重新调用检索与 LLM。
+    """
+    buffer = stream_registry.get(stream_id)
+    if not buffer:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    try:
+        after = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    if after + 1 < buffer.first_seq:
+        raise HTTPException(status_code=410, detail="Requested events are no longer buffered")
+
+    return StreamingResponse(
+        buffer.subscribe(after),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": buffer.stream_id}
+    )
 
 
 @app.post("/chat")
 async def chat_endpoint(
     payload: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """非流式 RAG 对话"""
     query = payload.get("query")
     project_id = payload.get("project_id")
-    top_k = payload.get("top_k", 5)
+    top_k = payload.get("top_k")
+    use_cache = payload.get("use_cache")
+    mode = payload.get("mode")
 
     if not query or not project_id:
         raise HTTPException(
             status_code=400,
             detail="query 和 project_id 为必填参数"
         )
+    if not is_valid_mode(mode):
+        raise HTTPException(status_code=400, detail=f"Unknown chat mode: {mode}")
 
-    session = get_or_create_current_session(db, project_id)
+    project = await db.get(Project, project_id)
+    if not project or project.status in UNAVAILABLE_STATUSES:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-    result = await chat_service.chat(
-        project_id=project_id,
-        query=query,
-        top_k=top_k
-    )
+    session = await get_or_create_current_session_async(db, project_id)
+    history = await history_service.build_history(db, session.id)
+
+    try:
+        ticket = await scheduler.acquire(project_id, CHAT)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    try:
+        result = await chat_service.chat(
+            project_id=project_id,
+            query=query,
+            top_k=top_k,
+            messages_history=history,
+            use_cache=use_cache,
+            mode=mode
+        )
+    finally:
+        ticket.release()
 
     # 保存消息
-    save_message(db, project_id, session.id, "user", query)
-    save_message(
+    await save_message(db, project_id, session.id, "user", query)
+    await save_message(
         db,
         project_id,
         session.id,
         "assistant",
         result["content"],
         reasoning_trace=result["reasoning_trace"],
-        search_results=json.dumps(result["contexts"], ensure_ascii=False)
+        contexts=result["contexts"]
     )
+    history_service.schedule_summary_update(session.id)
 
     return result
 
 
 # ==================== 向量搜索 ====================
 
-@app.post("/search")
-async def search_endpoint(payload: Dict[str, Any]) -> Dict[str, Any]:
+@app.post("/search", response_class=ORJSONResponse)
+async def search_endpoint(
+    payload: Dict[str, Any],
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
     """
     语义搜索
 
@@ -442,7 +935,19 @@ async def search_endpoint(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not query or not project_id:
         raise HTTPException(status_code=400, detail="Missing required parameters")
 
-    results = vector_store.search(project_id, query, top_k)
+    project = await db.get(Project, project_id)
+    if not project or project.status in UNAVAILABLE_STATUSES:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    try:
+        ticket = await scheduler.acquire(project_id, SEARCH)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    try:
+        results = await run_in_threadpool(vector_store.search, project_id, query, top_k)
+    finally:
+        ticket.release()
 
     return {
         "query": query,
@@ -464,32 +969,39 @@ def get_project_stats(
     project_id: str,
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """获取项目统计信息"""
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    file_count = db.query(func.count(File.id)).filter(File.project_id == project_id).scalar()
-    message_count = db.query(func.count(ChatMessage.id)).filter(ChatMessage.project_id == project_id).scalar()
-
-    # 获取向量集合统计
-    vector_stats = vector_store.get_collection_stats(project_id)
+    """获取项目统计信息 (直接读取项目行上维护的计数器)"""
+    project = require_available_project(db, project_id)
 
     return {
         "project_id": project_id,
         "project_name": project.name,
-        "files_count": file_count,
-        "messages_count": message_count,
-        "vectors_count": vector_stats.get("count", 0),
-        "last_active_at": project.last_active_at.isoformat() if project.last_active_at else None
+        "files_count": project.file_count or 0,
+        "messages_count": project.message_count or 0,
+        "vectors_count": project.vector_count or 0,
+        "last_active_at": project.last_active_at.isoformat() if project.last_active_at else None,
+        "reconciled_at": project.stats_reconciled_at.isoformat() if project.stats_reconciled_at else None
     }
 
 
+@app.post("/stats/reconcile")
+async def reconcile_stats(project_id: Optional[str] = None) -> Dict[str, Any]:
+    """按需校准项目统计计数器 (不指定项目时校准全部)"""
+    corrected = await run_in_threadpool(stats_service.reconcile, project_id)
+    return {"corrected": corrected}
+
 if __name__ == "__main__":
     import uvicorn
+    workers = max(settings.api_workers, 1)
+    if workers > 1 and not settings.chroma_server_host:
+        raise SystemExit(
+            "API_WORKERS > 1 requires CHROMA_SERVER_HOST: the embedded ChromaDB "
+            "client cannot be shared between processes"
+        )
     uvicorn.run(
         "app.main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=(settings.environment == "development")
+        workers=workers,
+        # 多进程模式不支持热重载
+        reload=(settings.environment == "development" and workers == 1)
     )
@@ -0,0 +1,176 @@
+"""
+对话历史全文检索
+chat_messages_fts 是以 chat_messages 为外部内容表的 FTS5 虚拟表 (由迁移创建，触发器保持同步)，
+默认使用 trigram 分词: 中文没有空格分词，按三字符切分可以做任意子串匹配。
+不足三个字符的检索词无法走 trigram 索引，退化为项目内的 LIKE 扫描
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+FTS_TABLE = "chat_messages_fts"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# 回退路径的片段长度 (字符)
+SNIPPET_CHARS = 64
+
+
+def create_fts_index(conn: Connection) -> str:
+    """创建 FTS5 表与同步触发器并回填，返回使用的分词器"""
+    tokenizer = "trigram"
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "content, content='chat_messages', content_rowid='rowid', tokenize='trigram')"
+        ))
+    except OperationalError:
+        # SQLite < 3.34 没有 trigram 分词器，使用默认的 unicode61 (按词匹配)
+        tokenizer = "unicode61"
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "content, content='chat_messages', content_rowid='rowid')"
+        ))
+
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON chat_messages BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.rowid, new.content); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON chat_messages BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.rowid, old.content); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content ON chat_messages BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.rowid, old.content); "
+        f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.rowid, new.content); END"
+    ))
+    rebuild_fts_index(conn)
+    return tokenizer
+
+
+def rebuild_fts_index(conn: Connection) -> None:
+    """
+    按 chat_messages 重建索引
+
+    外部内容表按 rowid 关联，VACUUM 可能重排没有 INTEGER 主键的表的 rowid，
+    手动 VACUUM 数据库后需要重建一次
+    """
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+class MessageSearchService:
+    """项目内对话历史检索"""
+
+    @staticmethod
+    def _terms(query: str) -> List[str]:
+        return [term for term in re.split(r"\s+", query.strip()) if term]
+
+    @staticmethod
+    def _match_expression(terms: List[str]) -> str:
+        """每个词作为短语 (双引号转义)，多个词之间为 AND"""
+        return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    def search(
+        self,
+        db: Session,
+        project_id: str,
+        query: str,
+        limit: int = 20,
+        session_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        检索项目 (或指定会话) 的消息，按相关度排序
+
+        Returns:
+            [
+                {
+                    "id": "...",
+                    "session_id": "...",
+                    "role": "assistant",
+                    "message_index": 12,
+                    "created_at": ...,
+                    "snippet": "... <mark>命中</mark> ...",
+                    "score": -3.2   # bm25，越小越相关; LIKE 回退时为 None
+                },
+                ...
+            ]
+        """
+        terms = self._terms(query)
+        if not terms:
+            return []
+        if min(len(term) for term in terms) < 3:
+            return self._search_like(db, project_id, terms, limit, session_id)
+
+        session_filter = "AND m.session_id = :session_id" if session_id else ""
+        rows = db.execute(text(
+            "SELECT m.id, m.session_id, m.role, m.message_index, m.created_at, "
+            f"snippet({FTS_TABLE}, 0, :hl_start, :hl_end, '…', 48) AS snippet, "
+            f"bm25({FTS_TABLE}) AS score "
+            f"FROM {FTS_TABLE} JOIN chat_messages m ON m.rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match AND m.project_id = :project_id {session_filter} "
+            "ORDER BY score LIMIT :limit"
+        ), {
+            "match": self._match_expression(terms),
+            "project_id": project_id,
+            "session_id": session_id,
+            "hl_start": HIGHLIGHT_START,
+            "hl_end": HIGHLIGHT_END,
+            "limit": limit
+        }).mappings().all()
+        return [dict(row) for row in rows]
+
+    def _search_like(
+        self,
+        db: Session,
+        project_id: str,
+        terms: List[str],
+        limit: int,
+        session_id: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """短检索词: 项目内 LIKE 扫描，按时间倒序，片段在 Python 中截取"""
+        params: Dict[str, Any] = {"project_id": project_id, "session_id": session_id, "limit": limit}
+        conditions = ["project_id = :project_id"]
+        if session_id:
+            conditions.append("session_id = :session_id")
+        for index, term in enumerate(terms):
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params[f"term{index}"] = f"%{escaped}%"
+            conditions.append(f"content LIKE :term{index} ESCAPE '\\'")
+
+        rows = db.execute(text(
+            "SELECT id, session_id, role, message_index, created_at, content "
+            f"FROM chat_messages WHERE {' AND '.join(conditions)} "
+            "ORDER BY created_at DESC LIMIT :limit"
+        ), params).mappings().all()
+        return [
+            {
+                **{key: row[key] for key in ("id", "session_id", "role", "message_index", "created_at")},
+                "snippet": self._snippet(row["content"], terms[0]),
+                "score": None
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _snippet(content: str, term: str) -> str:
+        """截取第一个命中位置附近的片段并高亮"""
+        position = content.lower().find(term.lower())
+        if position < 0:
+            return content[:SNIPPET_CHARS]
+        start = max(position - SNIPPET_CHARS // 2, 0)
+        end = min(position + len(term) + SNIPPET_CHARS // 2, len(content))
+        return (
+            ("…" if start > 0 else "")
+            + content[start:position]
+            + HIGHLIGHT_START + content[position:position + len(term)] + HIGHLIGHT_END
+            + content[position + len(term):end]
+            + ("…" if end < len(content) else "")
+        )
+
+
+# 全局实例
+message_search = MessageSearchService()
@@ -0,0 +1,184 @@
+"""
+Prometheus 指标
+进程内的计数器与直方图，/metrics 以 Prometheus 文本格式输出
+(多 worker 部署时每个进程各自统计，由抓取端按实例聚合)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# 默认秒级分桶: 覆盖 SQLite 提交 (毫秒级) 到 LLM 生成 (分钟级)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> ([每个分桶的计数], sum, count)
+        self._values: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """计时上下文 (异常时同样记录耗时)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局实例
+registry = Registry()
+
+EMBEDDING_REQUESTS = registry.counter(
+    "papermem_embedding_requests_total", "Embedding API calls", ("status",)
+)
+EMBEDDING_CACHE = registry.counter(
+    "papermem_embedding_cache_total", "Embedding cache lookups", ("result",)
+)
+EMBEDDING_BATCH_SIZE = registry.histogram(
+    "papermem_embedding_batch_size", "Texts per embedding API call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+EMBEDDING_SECONDS = registry.histogram(
+    "papermem_embedding_seconds", "Embedding API call latency"
+)
+CHROMA_SECONDS = registry.histogram(
+    "papermem_chroma_seconds", "ChromaDB operation latency", ("op",)
+)
+LLM_TTFT_SECONDS = registry.histogram(
+    "papermem_llm_ttft_seconds", "LLM time to first token", ("kind", "model")
+)
+LLM_TOTAL_SECONDS = registry.histogram(
+    "papermem_llm_total_seconds", "LLM call total time", ("kind", "model")
+)
+LLM_REQUESTS = registry.counter(
+    "papermem_llm_requests_total", "LLM calls", ("kind", "status")
+)
+CHAT_STAGE_SECONDS = registry.histogram(
+    "papermem_chat_stage_seconds", "Chat pipeline stage latency", ("stage",)
+)
+INGEST_STAGE_SECONDS = registry.histogram(
+    "papermem_ingest_stage_seconds", "PDF ingest stage duration (MinerU submit/poll/download, embed)", ("stage",)
+)
+SQLITE_COMMIT_SECONDS = registry.histogram(
+    "papermem_sqlite_commit_seconds", "SQLite session flush + commit time"
+)
+SSE_EVENTS_PER_STREAM = registry.histogram(
+    "papermem_sse_events_per_stream", "SSE events sent per chat stream",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+SSE_STREAMS = registry.counter(
+    "papermem_sse_streams_total", "Chat streams", ("status",)
+)
@@ -0,0 +1,256 @@
+"""
+轻量数据库迁移
+create_all 只会创建缺失的表，已有用户数据库的索引与表结构变更在这里按版本执行
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from app.models import MessageSource, beijing_now
+
+MigrationFunc = Callable[[Connection], None]
+
+MIGRATIONS: List[Tuple[int, str, MigrationFunc]] = []
+
+
+def migration(version: int, name: str):
+    """注册迁移 (版本号递增，已发布的迁移不要修改)"""
+    def decorator(func: MigrationFunc) -> MigrationFunc:
+        MIGRATIONS.append((version, name, func))
+        return func
+    return decorator
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(255) NOT NULL, "
+        "applied_at DATETIME NOT NULL)"
+    ))
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    """已执行的迁移版本"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        rows = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))
+        return [row[0] for row in rows]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    执行所有未执行的迁移，每个迁移在独立事务中执行
+
+    Returns:
+        本次执行的版本号列表
+    """
+    done = set(applied_versions(engine))
+    executed = []
+    for version, name, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        with engine.connect() as conn:
+            # 多个 worker 同时启动时，先取写锁再确认版本，保证每个迁移只执行一次
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            exists = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": version}
+            ).first()
+            if exists:
+                conn.rollback()
+                continue
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": beijing_now()}
+            )
+            conn.commit()
+        print(f"Applied migration {version}: {name}")
+        executed.append(version)
+    return executed
+
+
+# ==================== 迁移列表 ====================
+
+@migration(1, "composite indexes for hot queries")
+def _composite_indexes(conn: Connection) -> None:
+    # 消息分页: session_id = ? AND message_index < ? ORDER BY message_index
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_index "
+        "ON chat_messages (session_id, message_index)"
+    ))
+    # 当前会话: project_id = ? AND is_current = 1 ORDER BY created_at DESC
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_project_current "
+        "ON chat_sessions (project_id, is_current, created_at)"
+    ))
+    # 项目文件列表: project_id = ? ORDER BY created_at
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_files_project_created "
+        "ON files (project_id, created_at)"
+    ))
+
+
+@migration(2, "materialized project stats")
+def _project_stats(conn: Connection) -> None:
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(projects)"))}
+    if "vector_count" not in columns:
+        conn.execute(text("ALTER TABLE projects ADD COLUMN vector_count INTEGER DEFAULT 0"))
+    if "stats_reconciled_at" not in columns:
+        conn.execute(text("ALTER TABLE projects ADD COLUMN stats_reconciled_at DATETIME"))
+    # 用已有数据回填计数器 (向量数以文件记录的块数近似，之后由校准任务以 Chroma 为准修正)
+    conn.execute(text(
+        "UPDATE projects SET "
+        "message_count = (SELECT COUNT(*) FROM chat_messages m WHERE m.project_id = projects.id), "
+        "file_count = (SELECT COUNT(*) FROM files f "
+        "WHERE f.project_id = projects.id AND f.parse_status = 'completed'), "
+        "vector_count = (SELECT COALESCE(SUM(f.chunks_count), 0) FROM files f "
+        "WHERE f.project_id = projects.id AND f.parse_status = 'completed')"
+    ))
+
+
+@migration(3, "ingest lease columns")
+def _ingest_lease(conn: Connection) -> None:
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(files)"))}
+    if "ingest_owner" not in columns:
+        conn.execute(text("ALTER TABLE files ADD COLUMN ingest_owner VARCHAR(100)"))
+    if "ingest_lease_until" not in columns:
+        conn.execute(text("ALTER TABLE files ADD COLUMN ingest_lease_until DATETIME"))
+
+
+@migration(4, "files updated_at for conditional GET")
+def _files_updated_at(conn: Connection) -> None:
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(files)"))}
+    if "updated_at" not in columns:
+        conn.execute(text("ALTER TABLE files ADD COLUMN updated_at DATETIME"))
+    conn.execute(text(
+        "UPDATE files SET updated_at = COALESCE(parsed_at, created_at) WHERE updated_at IS NULL"
+    ))
+
+
+@migration(5, "message_sources table")
+def _message_sources(conn: Connection) -> None:
+    """
+    把 chat_messages.search_results 中的 JSON 来源拆分为 message_sources 行，然后删除该列
+
+    旧版本保存的是 {text, metadata, distance} (没有块ID)，按原文快照保存；
+    只有所有非空行都转换成功才删除该列，否则保留列，数据不丢失
+    """
+    MessageSource.__table__.create(conn, checkfirst=True)
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(chat_messages)"))}
+    if "search_results" not in columns:
+        return
+
+    insert = text(
+        "INSERT OR IGNORE INTO message_sources "
+        "(message_id, rank, project_id, chunk_id, distance, legacy_text, legacy_metadata) "
+        "VALUES (:message_id, :rank, :project_id, :chunk_id, :distance, :legacy_text, :legacy_metadata)"
+    )
+    # 按 rowid 分批读取，旧格式的 JSON 中含整段原文，不能一次全部载入内存
+    last_rowid = 0
+    unconverted = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT rowid, id, project_id, search_results FROM chat_messages "
+            "WHERE rowid > :last AND search_results IS NOT NULL "
+            "ORDER BY rowid LIMIT 500"
+        ), {"last": last_rowid}).all()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+
+        params = []
+        for _, message_id, project_id, raw in rows:
+            sources = _parse_search_results(raw)
+            if sources is None:
+                unconverted += 1
+                continue
+            for position, src in enumerate(sources, start=1):
+                chunk_id = src.get("id")
+                metadata = src.get("metadata")
+                params.append({
+                    "message_id": message_id,
+                    "rank": src.get("rank", position),
+                    "project_id": project_id,
+                    "chunk_id": chunk_id,
+                    "distance": src.get("distance"),
+                    "legacy_text": None if chunk_id else src.get("text"),
+                    "legacy_metadata": (
+                        json.dumps(metadata, ensure_ascii=False)
+                        if metadata is not None and not chunk_id else None
+                    )
+                })
+        if params:
+            conn.execute(insert, params)
+
+    if unconverted:
+        print(f"Kept chat_messages.search_results: {unconverted} rows could not be converted")
+        return
+    try:
+        conn.execute(text("ALTER TABLE chat_messages DROP COLUMN search_results"))
+    except OperationalError:
+        # SQLite < 3.35 不支持 DROP COLUMN，清空内容即可 (模型已不再读写该列)
+        conn.execute(text("UPDATE chat_messages SET search_results = NULL"))
+
+
+def _parse_search_results(raw: str) -> Optional[List[Dict[str, Any]]]:
+    """解析旧的 search_results JSON，格式无法识别时返回 None"""
+    try:
+        sources = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(sources, list) or not all(isinstance(src, dict) for src in sources):
+        return None
+    return sources
+
+
+@migration(6, "chat message full-text index")
+def _message_fts(conn: Connection) -> None:
+    from app.message_search import create_fts_index
+
+    tokenizer = create_fts_index(conn)
+    print(f"Built chat message search index ({tokenizer} tokenizer)")
+
+
+@migration(7, "projects status/last_active_at index")
+def _projects_status_active(conn: Connection) -> None:
+    # keyset 分页按 (last_active_at, id) 比较，空值会被跳过，先补齐
+    conn.execute(text(
+        "UPDATE projects SET last_active_at = COALESCE(updated_at, created_at) "
+        "WHERE last_active_at IS NULL"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_projects_status_active "
+        "ON projects (status, last_active_at, id)"
+    ))
+
+
+@migration(8, "ingest attempts and processing dedupe index")
+def _ingest_dedupe(conn: Connection) -> None:
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(files)"))}
+    if "ingest_attempts" not in columns:
+        conn.execute(text("ALTER TABLE files ADD COLUMN ingest_attempts INTEGER DEFAULT 0"))
+    # 已有的重复解析记录只保留最新一条，其余标记为失败，否则唯一索引无法创建
+    conn.execute(text(
+        "UPDATE files SET parse_status = 'failed', ingest_lease_until = NULL "
+        "WHERE parse_status = 'processing' AND rowid NOT IN ("
+        "SELECT MAX(rowid) FROM files WHERE parse_status = 'processing' GROUP BY project_id, file_url)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_files_processing_url "
+        "ON files (project_id, file_url) WHERE parse_status = 'processing'"
+    ))
+
+
+@migration(9, "projects (time, id) indexes for list ordering")
+def _projects_list_order(conn: Connection) -> None:
+    # 侧边栏不传 status，(status, ...) 索引用不上，按排序列 + id 单独建索引
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_projects_active_id ON projects (last_active_at, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_projects_created_id ON projects (created_at, id)"
+    ))
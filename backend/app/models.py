@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, text
 
 from app.database import Base
 
@@ -20,6 +20,9 @@ class Project(Base):
 
     message_count = Column(Integer, default=0)
     file_count = Column(Integer, default=0)
+    # 向量块数量 (与 message_count / file_count 一起随写入事务更新，统计接口直接读取)
+    vector_count = Column(Integer, default=0)
+    stats_reconciled_at = Column(DateTime)
     last_message_preview = Column(String(200))
 
     created_at = Column(DateTime, default=beijing_now, index=True)
@@ -28,6 +31,16 @@ class Project(Base):
 
     status = Column(String(20), default="active", index=True)
 
+    __table_args__ = (
+        # 项目列表按 (时间, id) 倒序 keyset 分页 (id 作为并列键)，无需额外排序
+        # 侧边栏: ORDER BY last_active_at DESC, id DESC
+        Index("ix_projects_active_id", "last_active_at", "id"),
+        # 默认列表: ORDER BY created_at DESC, id DESC
+        Index("ix_projects_created_id", "created_at", "id"),
+        # 按状态过滤: status = ? ORDER BY last_active_at DESC, id DESC
+        Index("ix_projects_status_active", "status", "last_active_at", "id"),
+    )
+
 
 class File(Base):
     """上传的文件记录"""
@@ -48,9 +61,24 @@ class File(Base):
     markdown_path = Column(String(500))  # 解析后的 Markdown 路径
     chunks_count = Column(Integer, default=0)  # 向量化的块数量
 
+    # 解析任务租约 (多进程部署时由持有租约的 worker 执行解析)
+    ingest_owner = Column(String(100))
+    ingest_lease_until = Column(DateTime)
+    ingest_attempts = Column(Integer, default=0)  # 领取次数，失败后自动重试到 ingest_max_attempts 为止
+
     created_at = Column(DateTime, default=beijing_now, index=True)
+    updated_at = Column(DateTime, default=beijing_now, onupdate=beijing_now)
     parsed_at = Column(DateTime)
 
+    __table_args__ = (
+        Index("ix_files_project_created", "project_id", "created_at"),
+        # 同一项目的同一文件同时只能有一条解析中的记录 (上传去重由插入冲突保证)
+        Index(
+            "ux_files_processing_url", "project_id", "file_url",
+            unique=True, sqlite_where=text("parse_status = 'processing'")
+        ),
+    )
+
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
@@ -65,6 +93,10 @@ class ChatSession(Base):
     created_at = Column(DateTime, default=beijing_now, index=True)
     last_message_at = Column(DateTime, default=beijing_now, index=True)
 
+    __table_args__ = (
+        Index("ix_chat_sessions_project_current", "project_id", "is_current", "created_at"),
+    )
+
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -76,8 +108,57 @@ class ChatMessage(Base):
     role = Column(String(50), nullable=False, index=True)
     content = Column(Text, nullable=False)
     reasoning_trace = Column(Text)
-    search_results = Column(Text)
     has_thinking = Column(Boolean, default=False)
     message_index = Column(Integer, default=0)
 
     created_at = Column(DateTime, default=beijing_now, index=True)
+
+    __table_args__ = (
+        Index("ix_chat_messages_session_index", "session_id", "message_index"),
+    )
+
+
+class MessageSource(Base):
+    """消息的检索来源 (每个引用的块一行，原文与元数据在 ChromaDB 中)"""
+    __tablename__ = "message_sources"
+
+    message_id = Column(String(36), ForeignKey("chat_messages.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    project_id = Column(String(36), ForeignKey("projects.id"), nullable=False, index=True)
+    chunk_id = Column(String(255))  # 旧版本消息的来源没有块ID，为空
+    distance = Column(Float)
+    # 旧版本消息的来源快照 (迁移自 chat_messages.search_results，无法对应到现有块)
+    legacy_text = Column(Text)
+    legacy_metadata = Column(Text)  # JSON
+
+
+class ChatSessionSummary(Base):
+    """会话滚动摘要 (超出历史 token 预算的早期消息被折叠到这里)"""
+    __tablename__ = "chat_session_summaries"
+
+    session_id = Column(String(36), ForeignKey("chat_sessions.id"), primary_key=True)
+    summary = Column(Text, default="")
+    summarized_upto = Column(Integer, default=0)  # 已折叠到摘要的最大 message_index
+
+    updated_at = Column(DateTime, default=beijing_now, onupdate=beijing_now)
+
+
+class EmbeddingCacheEntry(Base):
+    """嵌入向量缓存 (key 为模型名 + 文本的哈希，向量以 float32 打包)"""
+    __tablename__ = "embedding_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String(255), nullable=False)
+    dims = Column(Integer, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+
+    created_at = Column(DateTime, default=beijing_now, index=True)
+
+
+class JobLease(Base):
+    """后台定时任务租约 (多进程部署时同一任务每个周期只由一个 worker 执行)"""
+    __tablename__ = "job_leases"
+
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(100))
+    lease_until = Column(DateTime, nullable=False)
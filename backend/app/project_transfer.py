@@ -0,0 +1,376 @@
+"""
+项目导出 / 导入
+导出为 NDJSON 流: 每行一条记录，依次为 header、SQLite 行 (项目、文件、会话、摘要、消息、消息来源)、
+ChromaDB 向量 (含原文与元数据)，最后是 end 记录。
+向量可以是 JSON 数组，也可以是 base64 编码的 little-endian float32 (体积约为 JSON 的一半)。
+导入直接写回向量，不重新调用嵌入 API。两个方向都按批处理，内存占用与项目大小无关
+"""
+import base64
+import json
+import sys
+import tempfile
+import uuid
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from sqlalchemy import DateTime, insert, select, tuple_, update
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models import (
+    ChatMessage, ChatSession, ChatSessionSummary, File, MessageSource, Project, beijing_now
+)
+from app.vector_store import vector_store
+
+FORMAT = "papermem-project"
+FORMAT_VERSION = 1
+IMPORTING = "importing"
+# 导出时从临时文件读取并发送的块大小
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+# (记录类型, 模型)，按外键依赖顺序导出，导入时按同样顺序写入
+RECORD_MODELS = (
+    ("project", Project),
+    ("file", File),
+    ("session", ChatSession),
+    ("summary", ChatSessionSummary),
+    ("message", ChatMessage),
+    ("message_source", MessageSource),
+)
+MODELS_BY_TYPE = dict(RECORD_MODELS)
+# 导入时需要重新映射的ID列 (new_id=true)
+ID_COLUMNS = ("id", "session_id", "message_id")
+
+
+class ProjectImportError(ValueError):
+    """导入数据无效"""
+
+
+class ProjectConflictError(ProjectImportError):
+    """要导入的项目已存在"""
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, default=_encode_value) + "\n").encode("utf-8")
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _encode_embedding(embedding, encoding: str) -> Dict[str, Any]:
+    values = array("f", (float(x) for x in embedding))
+    if encoding == "json":
+        return {"embedding": values.tolist()}
+    if sys.byteorder == "big":
+        values.byteswap()
+    return {"embedding_f32": base64.b64encode(values.tobytes()).decode("ascii")}
+
+
+def _decode_embedding(record: Dict[str, Any]) -> List[float]:
+    if "embedding" in record:
+        return record["embedding"]
+    values = array("f", base64.b64decode(record["embedding_f32"]))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def _project_condition(model, project_id: str):
+    """模型中属于该项目的行"""
+    if model is Project:
+        return Project.id == project_id
+    if model is ChatSessionSummary:
+        return ChatSessionSummary.session_id.in_(
+            select(ChatSession.id).where(ChatSession.project_id == project_id)
+        )
+    return model.project_id == project_id
+
+
+class ProjectExporter:
+    """把项目导出为 NDJSON 字节流"""
+
+    def __init__(self):
+        self.batch_size = settings.transfer_batch_size
+
+    def _iter_rows(self, conn, model, project_id: str) -> Iterator[Dict[str, Any]]:
+        """按主键分页读取 (keyset)，每次只在内存中保留一页"""
+        table = model.__table__
+        keys = list(table.primary_key.columns)
+        last = None
+        while True:
+            query = select(table).where(_project_condition(model, project_id))
+            if last is not None:
+                query = query.where(tuple_(*keys) > tuple_(*last))
+            rows = conn.execute(query.order_by(*keys).limit(self.batch_size)).mappings().all()
+            if not rows:
+                return
+            yield from (dict(row) for row in rows)
+            last = [rows[-1][key.name] for key in keys]
+
+    def iter_ndjson(self, project_id: str, vectors: str = "f32") -> Iterator[bytes]:
+        """
+        导出项目 (同步生成器，由 StreamingResponse 在线程池中迭代)
+
+        SQLite 部分在同一个读事务中先写入临时文件，事务结束后再发送:
+        行之间保持一致，且读事务的时长与客户端接收速度无关 (长时间持有读事务会阻止 WAL checkpoint)
+        """
+        yield _line({
+            "type": "header",
+            "format": FORMAT,
+            "version": FORMAT_VERSION,
+            "project_id": project_id,
+            "embedding_model": settings.embedding_model,
+            "vectors": vectors,
+            "exported_at": beijing_now()
+        })
+
+        counts: Dict[str, int] = {}
+        with tempfile.TemporaryFile() as spool:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("BEGIN")
+                for record_type, model in RECORD_MODELS:
+                    for row in self._iter_rows(conn, model, project_id):
+                        record = {"type": record_type, "row": row}
+                        # 解析产物随文件记录一起导出 (按文件逐个读取)
+                        if record_type == "file" and row.get("markdown_path"):
+                            path = Path(row["markdown_path"])
+                            if path.is_file():
+                                record["markdown"] = path.read_text(encoding="utf-8")
+                        counts[record_type] = counts.get(record_type, 0) + 1
+                        spool.write(_line(record))
+                conn.rollback()
+
+            spool.seek(0)
+            yield from iter(lambda: spool.read(SPOOL_CHUNK_SIZE), b"")
+
+        for item in vector_store.iter_vectors(project_id, self.batch_size):
+            counts["vector"] = counts.get("vector", 0) + 1
+            yield _line({
+                "type": "vector",
+                "id": item["id"],
+                "document": item["document"],
+                "metadata": item["metadata"],
+                **_encode_embedding(item["embedding"], vectors)
+            })
+
+        yield _line({"type": "end", "counts": counts})
+
+
+class ProjectImporter:
+    """
+    从 NDJSON 记录恢复项目 (每次导入一个实例)
+
+    new_id=True 时为项目及其所有行生成新ID (由新项目ID与原ID确定性派生，
+    不需要在内存中保存映射表)，可以把项目复制到同一个数据库
+    """
+
+    def __init__(self, new_id: bool = False):
+        self.new_id = new_id
+        self.batch_size = settings.transfer_batch_size
+        self.project_id: Optional[str] = None
+        # 本次导入已写入的项目 (失败时只清理它，不会误删同ID的已有项目)
+        self.created_project_id: Optional[str] = None
+        self.source_project_id: Optional[str] = None
+        self.final_status = "active"
+        self.counts: Dict[str, int] = {}
+        self._header: Optional[Dict[str, Any]] = None
+        self._expected: Optional[Dict[str, int]] = None
+        self._pending_type: Optional[str] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._db = SessionLocal()
+
+    # ---------- ID 映射 ----------
+
+    def _map_id(self, value: Optional[str]) -> Optional[str]:
+        if not self.new_id or value is None:
+            return value
+        if value == self.source_project_id:
+            return self.project_id
+        return str(uuid.uuid5(uuid.UUID(self.project_id), value))
+
+    def _map_chunk_id(self, chunk_id: str) -> str:
+        """块ID形如 {project_id}_{file_id}_chunk_{i} (旧数据为 {project_id}_chunk_{i})"""
+        prefix = f"{self.source_project_id}_"
+        if not self.new_id or not chunk_id.startswith(prefix):
+            return chunk_id
+        rest = chunk_id[len(prefix):]
+        file_id, sep, tail = rest.partition("_chunk_")
+        if sep and file_id:
+            rest = f"{self._map_id(file_id)}_chunk_{tail}"
+        return f"{self.project_id}_{rest}"
+
+    def _map_row(self, record_type: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        table = MODELS_BY_TYPE[record_type].__table__
+        mapped = {}
+        for column in table.columns:
+            if column.name not in row:
+                continue
+            value = row[column.name]
+            if isinstance(column.type, DateTime) and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            if column.name == "project_id":
+                value = self.project_id
+            elif column.name in ID_COLUMNS:
+                value = self._map_id(value)
+            elif column.name == "chunk_id" and value is not None:
+                value = self._map_chunk_id(value)
+            mapped[column.name] = value
+        return mapped
+
+    # ---------- 记录处理 ----------
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """处理一条记录 (同类记录攒满一批后写入)"""
+        record_type = record.get("type")
+        if self._header is None:
+            self._check_header(record)
+            return
+        if self._expected is not None:
+            raise ProjectImportError("Records found after end record")
+        if record_type == "end":
+            self._flush()
+            self._expected = record.get("counts") or {}
+            return
+        if record_type == "project":
+            self._start_project(record["row"])
+            return
+        if self.project_id is None:
+            raise ProjectImportError("Project record must come before other records")
+        if record_type != "vector" and record_type not in MODELS_BY_TYPE:
+            raise ProjectImportError(f"Unknown record type: {record_type}")
+
+        if record_type != self._pending_type or len(self._pending) >= self.batch_size:
+            self._flush()
+            self._pending_type = record_type
+        self._pending.append(record)
+
+    def add_many(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            self.add(record)
+
+    async def import_stream(self, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        逐块读取 NDJSON 请求体并导入
+
+        解析在事件循环中进行，每攒满一批记录交给线程池写入 SQLite / ChromaDB
+        """
+        buffer = b""
+        batch: List[Dict[str, Any]] = []
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            batch.extend(json.loads(line) for line in lines if line.strip())
+            if len(batch) >= self.batch_size:
+                await run_in_threadpool(self.add_many, batch)
+                batch = []
+        if buffer.strip():
+            batch.append(json.loads(buffer))
+        await run_in_threadpool(self.add_many, batch)
+        return await run_in_threadpool(self.finish)
+
+    def _check_header(self, record: Dict[str, Any]) -> None:
+        if record.get("type") != "header" or record.get("format") != FORMAT:
+            raise ProjectImportError("Not a PaperMem project export")
+        if record.get("version") != FORMAT_VERSION:
+            raise ProjectImportError(f"Unsupported export version: {record.get('version')}")
+        # 不同嵌入模型的向量与当前模型生成的查询向量不可比较
+        if record.get("embedding_model") != settings.embedding_model:
+            raise ProjectImportError(
+                f"Export was embedded with {record.get('embedding_model')}, "
+                f"but EMBEDDING_MODEL is {settings.embedding_model}"
+            )
+        self._header = record
+
+    def _start_project(self, row: Dict[str, Any]) -> None:
+        if self.project_id is not None:
+            raise ProjectImportError("Export contains more than one project")
+        self.source_project_id = row["id"]
+        self.project_id = str(uuid.uuid4()) if self.new_id else row["id"]
+        if self._db.get(Project, self.project_id) is not None:
+            raise ProjectConflictError(
+                f"Project {self.project_id} already exists (use new_id=true to import a copy)"
+            )
+
+        values = self._map_row("project", row)
+        values["id"] = self.project_id
+        self.final_status = values.get("status") or "active"
+        # 导入完成前标记为导入中，失败时由删除服务清理
+        values["status"] = IMPORTING
+        self._db.execute(insert(Project).values(**values))
+        self._db.commit()
+        self.created_project_id = self.project_id
+        self.counts["project"] = 1
+
+    def _flush(self) -> None:
+        records, record_type = self._pending, self._pending_type
+        self._pending = []
+        if not records:
+            return
+        if record_type == "vector":
+            self._write_vectors(records)
+        else:
+            rows = []
+            for record in records:
+                row = self._map_row(record_type, record["row"])
+                if record_type == "file":
+                    row["markdown_path"] = self._write_markdown(row, record.get("markdown"))
+                rows.append(row)
+            self._db.execute(insert(MODELS_BY_TYPE[record_type]), rows)
+            self._db.commit()
+        self.counts[record_type] = self.counts.get(record_type, 0) + len(records)
+
+    def _write_markdown(self, row: Dict[str, Any], markdown: Optional[str]) -> Optional[str]:
+        """写入解析产物 (命名与解析服务一致)，导出中没有时清空路径"""
+        if markdown is None:
+            return None
+        parsed_dir = Path(settings.get_parsed_files_path())
+        parsed_dir.mkdir(parents=True, exist_ok=True)
+        # 文件名来自导入数据，只取最后一段，防止写到解析目录之外
+        path = parsed_dir / f"{self.project_id}_{Path(row['file_name']).name}.md"
+        path.write_text(markdown, encoding="utf-8")
+        return str(path)
+
+    def _write_vectors(self, records: List[Dict[str, Any]]) -> None:
+        metadatas = []
+        for record in records:
+            metadata = dict(record.get("metadata") or {})
+            if "project_id" in metadata:
+                metadata["project_id"] = self.project_id
+            metadatas.append(metadata)
+        vector_store.upsert_vectors(
+            project_id=self.project_id,
+            ids=[self._map_chunk_id(record["id"]) for record in records],
+            embeddings=[_decode_embedding(record) for record in records],
+            documents=[record.get("document") for record in records],
+            metadatas=metadatas
+        )
+
+    def finish(self) -> Dict[str, Any]:
+        """校验完整性并启用项目"""
+        if self.project_id is None:
+            raise ProjectImportError("Export contains no project")
+        if self._expected is None:
+            raise ProjectImportError("Export is truncated (missing end record)")
+        if self._expected != self.counts:
+            raise ProjectImportError(
+                f"Record counts do not match the end record: {self.counts} != {self._expected}"
+            )
+        self._db.execute(
+            update(Project).where(Project.id == self.project_id).values(status=self.final_status)
+        )
+        self._db.commit()
+        return {"project_id": self.project_id, "counts": dict(self.counts)}
+
+    def close(self) -> None:
+        self._db.rollback()
+        self._db.close()
+
+
+# 全局实例
+project_exporter = ProjectExporter()
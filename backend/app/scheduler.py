@@ -0,0 +1,198 @@
+"""
+请求准入控制
+限制同时进行的上游调用 (检索 / LLM 生成)，超出时排队，队列满时拒绝
+
+- 全局并发上限: 所有检索与生成共享
+- 项目并发上限: 单个项目同时进行的对话生成数量
+- 优先级: 交互式检索优先于对话生成，且为检索预留全局名额，
+  长时间的生成不会让检索排队
+"""
+import asyncio
+import itertools
+from typing import AsyncGenerator, Dict, List, Optional
+
+from app.config import settings
+
+SEARCH = "search"
+CHAT = "chat"
+
+# 数值越小优先级越高
+_PRIORITY = {SEARCH: 0, CHAT: 1}
+
+
+class QueueFullError(Exception):
+    """等待队列已满"""
+
+
+class Ticket:
+    """一次准入请求"""
+
+    def __init__(self, scheduler: "Scheduler", project_id: str, kind: str, seq: int):
+        self.scheduler = scheduler
+        self.project_id = project_id
+        self.kind = kind
+        self.priority = _PRIORITY[kind]
+        self.seq = seq
+        self.admitted = False
+        self.released = False
+        self._changed = asyncio.Event()
+
+    @property
+    def sort_key(self):
+        return (self.priority, self.seq)
+
+    def position(self) -> int:
+        """当前排队位置 (从 1 开始，已准入返回 0)"""
+        if self.admitted:
+            return 0
+        return self.scheduler._position(self)
+
+    async def wait(self) -> AsyncGenerator[int, None]:
+        """
+        等待准入，排队位置变化时产出新位置
+
+        已准入时不产出任何值直接结束；等待期间被取消会自动退出队列。
+        先清除事件再读取状态: 调用方处理产出值 (发送 SSE) 期间的通知不会丢失
+        """
+        last = None
+        try:
+            while not self.admitted:
+                self._changed.clear()
+                position = self.position()
+                if position != last:
+                    last = position
+                    yield position
+                if self.admitted:
+                    break
+                await self._changed.wait()
+        except BaseException:
+            if not self.admitted:
+                self.scheduler._withdraw(self)
+            raise
+
+    def release(self) -> None:
+        """释放名额 (可重复调用)"""
+        if self.released:
+            return
+        self.released = True
+        if self.admitted:
+            self.scheduler._release(self)
+        else:
+            self.scheduler._withdraw(self)
+
+    def _notify(self) -> None:
+        self._changed.set()
+
+
+class Scheduler:
+    """检索与对话生成的准入调度器"""
+
+    def __init__(
+        self,
+        global_limit: Optional[int] = None,
+        project_limit: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        search_reserved: Optional[int] = None
+    ):
+        self.global_limit = settings.scheduler_global_limit if global_limit is None else global_limit
+        self.project_limit = settings.scheduler_project_limit if project_limit is None else project_limit
+        self.queue_size = settings.scheduler_queue_size if queue_size is None else queue_size
+        self.search_reserved = (
+            settings.scheduler_search_reserved if search_reserved is None else search_reserved
+        )
+
+        self._seq = itertools.count(1)
+        self._active = 0
+        self._active_chats: Dict[str, int] = {}
+        self._waiting: List[Ticket] = []
+        self.rejected = 0
+
+    def _eligible(self, ticket: Ticket) -> bool:
+        if ticket.kind == SEARCH:
+            return self._active < self.global_limit
+        if self._active >= self.global_limit - self.search_reserved:
+            return False
+        return self._active_chats.get(ticket.project_id, 0) < self.project_limit
+
+    def _admit(self, ticket: Ticket) -> None:
+        ticket.admitted = True
+        self._active += 1
+        if ticket.kind == CHAT:
+            self._active_chats[ticket.project_id] = self._active_chats.get(ticket.project_id, 0) + 1
+        ticket._notify()
+
+    def _dispatch(self) -> None:
+        """按优先级准入所有满足条件的等待者，并通知排队位置变化"""
+        for ticket in list(self._waiting):
+            if self._eligible(ticket):
+                self._waiting.remove(ticket)
+                self._admit(ticket)
+        for ticket in self._waiting:
+            ticket._notify()
+
+    def _position(self, ticket: Ticket) -> int:
+        try:
+            return self._waiting.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def _withdraw(self, ticket: Ticket) -> None:
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            self._dispatch()
+
+    def _release(self, ticket: Ticket) -> None:
+        self._active -= 1
+        if ticket.kind == CHAT:
+            remaining = self._active_chats.get(ticket.project_id, 1) - 1
+            if remaining > 0:
+                self._active_chats[ticket.project_id] = remaining
+            else:
+                self._active_chats.pop(ticket.project_id, None)
+        self._dispatch()
+
+    def enqueue(self, project_id: str, kind: str = CHAT) -> Ticket:
+        """
+        申请名额，有空闲时立即准入，否则进入等待队列
+
+        Raises:
+            QueueFullError: 对话生成的等待队列已满
+        """
+        ticket = Ticket(self, project_id, kind, next(self._seq))
+        if not self._waiting and self._eligible(ticket):
+            self._admit(ticket)
+            return ticket
+
+        # 检索不受队列长度限制，保证交互式检索始终能排上
+        waiting_chats = sum(1 for t in self._waiting if t.kind == CHAT)
+        if kind == CHAT and waiting_chats >= self.queue_size:
+            self.rejected += 1
+            raise QueueFullError("Too many pending requests, please retry later")
+
+        self._waiting.append(ticket)
+        self._waiting.sort(key=lambda t: t.sort_key)
+        self._dispatch()
+        return ticket
+
+    async def acquire(self, project_id: str, kind: str = CHAT) -> Ticket:
+        """申请并等待准入 (不关心排队位置时使用)"""
+        ticket = self.enqueue(project_id, kind)
+        async for _ in ticket.wait():
+            pass
+        return ticket
+
+    def get_stats(self) -> Dict:
+        """调度器统计"""
+        return {
+            "active": self._active,
+            "active_chats": dict(self._active_chats),
+            "waiting": len(self._waiting),
+            "rejected": self.rejected,
+            "global_limit": self.global_limit,
+            "project_limit": self.project_limit,
+            "queue_size": self.queue_size
+        }
+
+
+# 全局实例
+scheduler = Scheduler()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -17,6 +17,7 @@ class ProjectRead(BaseModel):
     description: Optional[str] = None
     message_count: int = 0
     file_count: int = 0
+    vector_count: int = 0
     last_message_preview: Optional[str] = None
     created_at: datetime
     updated_at: datetime
@@ -26,6 +27,18 @@ class ProjectRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProjectSummary(BaseModel):
+    """项目列表精简投影 (view=summary，供侧边栏使用)"""
+    id: str
+    name: str
+    message_count: int = 0
+    file_count: int = 0
+    vector_count: int = 0
+    last_active_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class FileResponse(BaseModel):
     id: str
     project_id: str
@@ -68,9 +81,40 @@ class ChatMessageRead(BaseModel):
     role: str
     content: str
     reasoning_trace: Optional[str] = None
-    search_results: Optional[str] = None
+    sources: Optional[List[Dict[str, Any]]] = None  # 检索来源，hydrate=true 时含原文与元数据
+    has_thinking: bool
+    message_index: int
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChatMessageListItem(BaseModel):
+    """消息列表轻量投影 (不含 reasoning_trace)"""
+    id: str
+    session_id: str
+    project_id: str
+    role: str
+    content: str
     has_thinking: bool
     message_index: int
     created_at: datetime
+    sources: Optional[List[Dict[str, Any]]] = None  # include_sources=true 时返回
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class MessageSearchHit(BaseModel):
+    """对话历史检索结果 (snippet 中命中部分以 <mark> 标出)"""
+    id: str
+    session_id: str
+    role: str
+    message_index: int
+    created_at: datetime
+    snippet: str
+    score: Optional[float] = None  # bm25，越小越相关; 短检索词回退扫描时为空
+
+
+class MessageSearchResults(BaseModel):
+    query: str
+    items: List[MessageSearchHit]
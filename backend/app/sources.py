@@ -0,0 +1,77 @@
+"""
+消息检索来源
+每条消息引用的块保存在 message_sources 表 (块ID、排名、距离)，
+查看来源时再从 ChromaDB 取回原文，避免每条消息重复保存整段参考资料。
+旧版本消息的来源没有块ID，迁移时保存了原文快照，直接返回快照
+"""
+import json
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import select
+
+from app.models import ChatMessage, MessageSource
+from app.vector_store import vector_store
+
+
+def build_sources(message_id: str, project_id: str, contexts: List[Dict]) -> List[MessageSource]:
+    """检索上下文 -> message_sources 行 (rank 从 1 开始)"""
+    return [
+        MessageSource(
+            message_id=message_id,
+            project_id=project_id,
+            rank=ctx.get("rank", position),
+            chunk_id=ctx["id"],
+            distance=ctx.get("distance")
+        )
+        for position, ctx in enumerate(contexts, start=1)
+        if ctx.get("id")
+    ]
+
+
+def sources_query(project_id: str, message_ids: Iterable[str]):
+    """按消息批量读取来源 (联表限定项目，按消息与排名排序)"""
+    return (
+        select(
+            MessageSource.message_id, MessageSource.chunk_id, MessageSource.rank, MessageSource.distance,
+            MessageSource.legacy_text, MessageSource.legacy_metadata
+        )
+        .join(ChatMessage, ChatMessage.id == MessageSource.message_id)
+        .where(ChatMessage.project_id == project_id, MessageSource.message_id.in_(list(message_ids)))
+        .order_by(MessageSource.message_id, MessageSource.rank)
+    )
+
+
+def group_sources(rows) -> Dict[str, List[Dict[str, Any]]]:
+    """查询结果 -> {message_id: [{id, rank, distance}]} (旧版本来源 id 为空，附带原文快照)"""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        source = {
+            "id": row.chunk_id,
+            "rank": row.rank,
+            "distance": row.distance
+        }
+        if row.chunk_id is None:
+            source["text"] = row.legacy_text
+            source["metadata"] = json.loads(row.legacy_metadata) if row.legacy_metadata else None
+        grouped.setdefault(row.message_id, []).append(source)
+    return grouped
+
+
+def hydrate_sources(project_id: str, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    从 ChromaDB 还原检索来源的原文与元数据
+
+    已删除的块返回 text=None，旧版本来源保留快照。
+    """
+    chunk_ids = [src["id"] for src in sources if src["id"] is not None]
+    if not chunk_ids:
+        return sources
+    documents = vector_store.get_documents(project_id, chunk_ids)
+    return [
+        {
+            **src,
+            "text": documents.get(src["id"], {}).get("text"),
+            "metadata": documents.get(src["id"], {}).get("metadata")
+        } if src["id"] is not None else src
+        for src in sources
+    ]
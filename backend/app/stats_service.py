@@ -0,0 +1,154 @@
+"""
+项目统计校准
+计数器随写入事务增量维护 (消息 / 文件 / 向量)，这里定期或按需以实际数据为准重新计算，
+修正崩溃、手工改库等造成的偏差
+"""
+import asyncio
+import os
+import socket
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import engine
+from app.deletion_service import DELETING
+from app.models import ChatMessage, File, JobLease, Project, beijing_now
+from app.vector_store import vector_store
+
+RECONCILE_JOB = "stats_reconcile"
+
+
+class StatsService:
+    """项目计数器校准"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def _file_state(conn: Connection, project_id: str) -> Tuple[int, bool]:
+        """(已完成的文件数, 是否有解析中的文件)"""
+        completed = conn.scalar(
+            select(func.count(File.id)).where(File.project_id == project_id, File.parse_status == "completed")
+        ) or 0
+        ingesting = conn.scalar(
+            select(File.id).where(File.project_id == project_id, File.parse_status == "processing").limit(1)
+        )
+        return completed, ingesting is not None
+
+    def reconcile_project(self, conn: Connection, project_id: str) -> Optional[Dict[str, int]]:
+        """
+        重新计算单个项目的计数器，返回修正前后的差值 (项目不存在或正在删除时返回 None)
+
+        SQLite 计数与覆盖在同一个 BEGIN IMMEDIATE 写事务中完成，期间并发的计数器自增等待该事务结束，
+        不会被旧的计数覆盖。向量数来自 ChromaDB (可能是 HTTP 调用)，在取写锁之前读取；
+        读取时或读取之后有文件在解析 / 完成解析，向量数可能与计数器不对应，此时保留原值，留给下次校准
+        """
+        files_before, ingesting_before = self._file_state(conn, project_id)
+        conn.rollback()
+        vector_count = None if ingesting_before else vector_store.count_documents(project_id)
+
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        project = conn.execute(
+            select(Project.message_count, Project.file_count, Project.vector_count)
+            .where(Project.id == project_id, Project.status != DELETING)
+        ).first()
+        if project is None:
+            conn.rollback()
+            return None
+
+        message_count = conn.scalar(
+            select(func.count(ChatMessage.id)).where(ChatMessage.project_id == project_id)
+        ) or 0
+        file_count, ingesting = self._file_state(conn, project_id)
+        if vector_count is None or ingesting or file_count != files_before:
+            vector_count = project.vector_count or 0
+
+        conn.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(
+                message_count=message_count,
+                file_count=file_count,
+                vector_count=vector_count,
+                stats_reconciled_at=beijing_now()
+            )
+        )
+        conn.commit()
+        return {
+            "messages": message_count - (project.message_count or 0),
+            "files": file_count - (project.file_count or 0),
+            "vectors": vector_count - (project.vector_count or 0),
+        }
+
+    def reconcile(self, project_id: Optional[str] = None) -> List[Dict]:
+        """
+        校准计数器 (每个项目单独一个写事务，缩短写锁持有时间)
+
+        Args:
+            project_id: 指定项目，为空时校准全部项目
+
+        Returns:
+            有偏差的项目及其差值
+        """
+        with engine.connect() as conn:
+            if project_id:
+                project_ids = [project_id]
+            else:
+                project_ids = list(conn.scalars(select(Project.id).where(Project.status != DELETING)))
+                conn.rollback()
+
+            corrected = []
+            for pid in project_ids:
+                drift = self.reconcile_project(conn, pid)
+                if drift and any(drift.values()):
+                    corrected.append({"project_id": pid, "drift": drift})
+            return corrected
+
+    def claim_periodic_run(self, lease_seconds: float) -> bool:
+        """
+        领取本周期的定时校准 (条件 upsert，多个 worker 同时领取只有一个成功)
+
+        租约未过期时不更新，rowcount 为 0
+        """
+        now = beijing_now()
+        stmt = insert(JobLease).values(
+            name=RECONCILE_JOB,
+            owner=self.worker_id,
+            lease_until=now + timedelta(seconds=lease_seconds)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[JobLease.name],
+            set_={"owner": stmt.excluded.owner, "lease_until": stmt.excluded.lease_until},
+            where=JobLease.lease_until < now
+        )
+        with engine.begin() as conn:
+            return conn.execute(stmt).rowcount == 1
+
+    async def run_periodic(self) -> None:
+        """
+        按 stats_reconcile_interval_hours 周期在后台校准全部项目
+
+        每个 worker 都会启动该任务，但每个周期只有领取到租约的 worker 执行校准
+        (租约为半个周期: 同时醒来的其他 worker 领取失败，下个周期重新竞争)
+        """
+        interval = settings.stats_reconcile_interval_hours * 3600
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await run_in_threadpool(self.claim_periodic_run, interval / 2):
+                    continue
+                corrected = await run_in_threadpool(self.reconcile)
+                print(f"Stats reconciled: {len(corrected)} projects corrected")
+            except Exception as e:
+                print(f"Stats reconciliation failed: {e}")
+
+
+# 全局实例
+stats_service = StatsService()
@@ -0,0 +1,276 @@
+"""
+SSE 流式输出工具
+- 将高频的 token 增量事件合并后再下发，减少序列化与前端重渲染次数
+- 为每个流分配 stream_id 和递增事件 ID，断线后可按 Last-Event-ID 续传
+"""
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# 可合并的文本增量事件类型
+COALESCE_TYPES = ("reasoning", "content_chunk")
+
+_SENTINEL = object()
+
+
+def format_sse(event: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """将事件序列化为一帧 SSE 数据"""
+    data = f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+    if event_id is None:
+        return data
+    return f"id: {event_id}\n{data}"
+
+
+class EventCoalescer:
+    """
+    合并连续的同类型文本增量事件
+
+    缓冲区在以下任一条件满足时刷新:
+        - 距离首个缓冲片段超过 flush_interval_ms
+        - 缓冲文本超过 flush_bytes 字节
+        - 收到不同类型的事件 (保证事件顺序不变)
+        - 上游结束
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: Optional[int] = None,
+        flush_bytes: Optional[int] = None
+    ):
+        interval = settings.sse_flush_interval_ms if flush_interval_ms is None else flush_interval_ms
+        self.flush_interval = max(interval, 0) / 1000
+        self.flush_bytes = settings.sse_flush_bytes if flush_bytes is None else flush_bytes
+
+        self._type: Optional[str] = None
+        self._parts: List[str] = []
+        self._size = 0
+        self._started_at = 0.0
+
+    def _take(self) -> Optional[Dict[str, Any]]:
+        """取出缓冲区中的合并事件"""
+        if not self._parts:
+            return None
+        event = {"type": self._type, "content": "".join(self._parts)}
+        self._type = None
+        self._parts = []
+        self._size = 0
+        return event
+
+    def _push(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """放入一个事件，返回需要立即下发的事件列表"""
+        out = []
+        event_type = event.get("type")
+
+        if event_type not in COALESCE_TYPES:
+            flushed = self._take()
+            if flushed:
+                out.append(flushed)
+            out.append(event)
+            return out
+
+        if self._type is not None and self._type != event_type:
+            flushed = self._take()
+            if flushed:
+                out.append(flushed)
+
+        content = event.get("content") or ""
+        if not self._parts:
+            self._started_at = time.monotonic()
+        self._type = event_type
+        self._parts.append(content)
+        self._size += len(content.encode("utf-8"))
+
+        if self.flush_bytes > 0 and self._size >= self.flush_bytes:
+            out.append(self._take())
+        return out
+
+    def _remaining(self) -> Optional[float]:
+        """距离按时间刷新还剩多少秒 (无缓冲时返回 None)"""
+        if not self._parts:
+            return None
+        return max(self.flush_interval - (time.monotonic() - self._started_at), 0)
+
+    async def coalesce(
+        self,
+        events: AsyncIterator[Dict[str, Any]]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        包装上游事件流，输出合并后的事件
+
+        上游在独立任务中运行，即使模型暂停输出，缓冲区也会按时间刷新。
+        flush_interval_ms <= 0 时关闭合并，逐条透传。
+        """
+        if self.flush_interval <= 0:
+            async for event in events:
+                yield event
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce() -> None:
+            try:
+                async for event in events:
+                    await queue.put(event)
+            except Exception as e:
+                await queue.put({"type": "error", "content": str(e)})
+            finally:
+                await queue.put(_SENTINEL)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self._remaining())
+                except asyncio.TimeoutError:
+                    flushed = self._take()
+                    if flushed:
+                        yield flushed
+                    continue
+
+                if item is _SENTINEL:
+                    break
+                for event in self._push(item):
+                    yield event
+
+            flushed = self._take()
+            if flushed:
+                yield flushed
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+
+class ReplayGapError(Exception):
+    """请求续传的事件已被环形缓冲区淘汰"""
+
+
+class StreamBuffer:
+    """
+    单个流的环形事件缓冲区
+
+    生成端通过 append() 写入事件，任意数量的订阅端通过 subscribe() 读取，
+    客户端断开不会中断生成，重连后从 Last-Event-ID 之后继续。
+    """
+
+    def __init__(self, stream_id: str, max_events: int):
+        self.stream_id = stream_id
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=max_events)
+        self.next_seq = 1
+        self.finished = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._cond = asyncio.Condition()
+
+    @property
+    def first_seq(self) -> int:
+        """缓冲区中最早一条事件的 ID"""
+        return self.events[0][0] if self.events else self.next_seq
+
+    async def append(self, event: Dict[str, Any]) -> int:
+        """写入事件并唤醒订阅端，返回事件 ID"""
+        async with self._cond:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.events.append((seq, format_sse(event, seq)))
+            self._cond.notify_all()
+        return seq
+
+    async def close(self) -> None:
+        """标记流结束"""
+        async with self._cond:
+            self.finished = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncGenerator[str, None]:
+        """
+        从 last_event_id 之后开始读取 SSE 帧，直到流结束
+
+        已开始输出后订阅端落后于缓冲区 (事件被淘汰) 时，发送一帧 gap 事件后正常结束，
+        客户端据此改为从消息历史读取完整回答
+
+        Raises:
+            ReplayGapError: 输出第一帧之前发现 last_event_id 之后的事件已被淘汰
+        """
+        if last_event_id + 1 < self.first_seq:
+            raise ReplayGapError(
+                f"Events after {last_event_id} are no longer buffered "
+                f"(oldest: {self.first_seq})"
+            )
+
+        cursor = last_event_id
+        sent = False
+        while True:
+            async with self._cond:
+                while self.next_seq - 1 <= cursor and not self.finished:
+                    await self._cond.wait()
+                gap = cursor + 1 < self.first_seq
+                frames = [] if gap else [(seq, frame) for seq, frame in self.events if seq > cursor]
+                done = self.finished
+
+            if gap:
+                if not sent:
+                    raise ReplayGapError(
+                        f"Events after {cursor} are no longer buffered (oldest: {self.first_seq})"
+                    )
+                # 不带事件 ID，客户端记录的 Last-Event-ID 保持不变
+                yield format_sse({
+                    "type": "gap",
+                    "stream_id": self.stream_id,
+                    "last_event_id": cursor,
+                    "content": "Subscriber fell behind: buffered events were evicted"
+                })
+                return
+
+            for seq, frame in frames:
+                cursor = seq
+                sent = True
+                yield frame
+
+            if done and cursor >= self.next_seq - 1:
+                return
+
+
+class StreamRegistry:
+    """进程内活跃流注册表，已结束的流保留 ttl 秒供重连续传"""
+
+    def __init__(
+        self,
+        max_events: Optional[int] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        self.max_events = max_events or settings.sse_replay_buffer_size
+        self.ttl_seconds = settings.sse_stream_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._streams: Dict[str, StreamBuffer] = {}
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            stream_id
+            for stream_id, buffer in self._streams.items()
+            if buffer.finished and now - buffer.finished_at > self.ttl_seconds
+        ]
+        for stream_id in expired:
+            del self._streams[stream_id]
+
+    def create(self) -> StreamBuffer:
+        """创建新的流缓冲区"""
+        self._evict_expired()
+        stream_id = uuid.uuid4().hex
+        buffer = StreamBuffer(stream_id, self.max_events)
+        self._streams[stream_id] = buffer
+        return buffer
+
+    def get(self, stream_id: str) -> Optional[StreamBuffer]:
+        """获取流缓冲区 (已过期或不存在时返回 None)"""
+        self._evict_expired()
+        return self._streams.get(stream_id)
+
+
+# 全局实例
+stream_registry = StreamRegistry()
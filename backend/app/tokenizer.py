@@ -0,0 +1,36 @@
+"""
+本地 Token 计数
+按字符类型估算，不依赖分词器 (预算只需大致准确，且离线运行时无需下载编码文件)
+"""
+import re
+from typing import Optional
+
+# CJK 字符大致一个字一个 token，其余文本约 4 个字符一个 token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """按字符类型估算文本 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """将文本截断到不超过 max_tokens"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    # 二分查找满足预算的最长前缀
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
@@ -0,0 +1,191 @@
+"""
+请求追踪
+每个 HTTP 请求分配一个追踪ID，请求内 (包括由它派生的后台任务) 的各阶段 span
+以 Chrome Trace Event 格式追加写入数据目录下的 traces/trace-YYYYMMDD-<pid>.json，
+可直接用 chrome://tracing 或 https://ui.perfetto.dev 打开 (多进程部署时每个 worker 一个文件)
+
+文件以 "[" 开头，每行一个事件并以逗号结尾 (Trace Event 格式允许省略结尾的 "]")，
+因此既能逐行追加，也能直接加载。
+事件先放入内存队列，由后台线程批量写入，请求处理 (事件循环) 中不做文件 IO
+"""
+import atexit
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+# (trace_id, tid): tid 为每个请求分配的整数，查看器中每个请求占一行
+_current_trace: ContextVar[Optional[tuple]] = ContextVar("papermem_trace", default=None)
+_tid_counter = itertools.count(1)
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+class TraceWriter:
+    """追加写入 Chrome Trace 事件 (按天、按进程分文件，后台线程写入)"""
+
+    def __init__(self, max_pending: int = 10000):
+        self.enabled = settings.tracing_enabled
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self.dropped = 0
+
+    def _path(self) -> Path:
+        trace_dir = Path(settings.trace_dir).expanduser()
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        return trace_dir / f"trace-{datetime.now():%Y%m%d}-{self._pid}.json"
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        """后台线程: 取出队列中已有的全部事件，一次写入"""
+        while True:
+            line = self._queue.get()
+            lines = [line]
+            while line is not None:
+                try:
+                    line = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                lines.append(line)
+
+            batch = [item for item in lines if item is not None]
+            if batch:
+                try:
+                    self._append(batch)
+                except OSError as e:
+                    print(f"Failed to write trace events: {e}")
+            if lines[-1] is None:
+                return
+
+    def _append(self, lines: List[str]) -> None:
+        path = self._path()
+        is_new = not path.exists()
+        with open(path, "a", encoding="utf-8") as f:
+            if is_new:
+                f.write("[\n")
+            f.writelines(lines)
+
+    def write(self, event: Dict[str, Any]) -> None:
+        """放入写入队列 (队列满时丢弃并计数，不阻塞调用方)"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写完队列中剩余的事件后停止后台线程"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def record(
+        self,
+        name: str,
+        start_us: int,
+        duration_us: int,
+        cat: str = "app",
+        **args: Any
+    ) -> None:
+        """记录一个已结束的 span (不在追踪上下文中时忽略)"""
+        trace = _current_trace.get()
+        if not self.enabled or trace is None:
+            return
+        trace_id, tid = trace
+        try:
+            self.write({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start_us,
+                "dur": max(duration_us, 0),
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"trace_id": trace_id, **args}
+            })
+        except (TypeError, ValueError) as e:
+            print(f"Failed to serialize trace event: {e}")
+
+
+# 全局实例
+tracer = TraceWriter()
+
+
+@contextmanager
+def span(name: str, cat: str = "app", **args: Any):
+    """记录代码块耗时 (异常时同样记录，并标记 error)"""
+    if not tracer.enabled or _current_trace.get() is None:
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        tracer.record(name, start, _now_us() - start, cat=cat, **args)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace[0] if trace else None
+
+
+class TracingMiddleware:
+    """为每个 HTTP 请求建立追踪上下文并记录根 span，响应头返回 X-Trace-Id"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = uuid.uuid4().hex
+        token = _current_trace.set((trace_id, next(_tid_counter)))
+        status = {"code": None}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                MutableHeaders(scope=message).append("X-Trace-Id", trace_id)
+            await send(message)
+
+        start = _now_us()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            tracer.record(
+                f"{scope['method']} {scope['path']}", start, _now_us() - start,
+                cat="http", status=status["code"]
+            )
+            _current_trace.reset(token)
@@ -2,13 +2,22 @@
 ChromaDB 向量存储服务
 用于存储和检索文档嵌入向量
 """
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 import os
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from openai import OpenAI
+import threading
+import time
 
+from app.answer_cache import answer_cache
 from app.config import settings
+from app.embedding_cache import embedding_cache
+from app.llm_client import get_sync_client, llm_stats
+from app.metrics import (
+    CHROMA_SECONDS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE,
+    EMBEDDING_REQUESTS,
+    EMBEDDING_SECONDS,
+)
 
 # 禁用 ChromaDB telemetry
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
@@ -18,38 +27,79 @@ class VectorStore:
     """ChromaDB 向量存储管理器"""
 
     def __init__(self):
-        """初始化 ChromaDB 客户端"""
-        chroma_path = settings.get_chroma_path()
+        """只记录配置，ChromaDB 客户端在首次使用或后台预热时创建"""
+        self._client = None
+        self._client_lock = threading.Lock()
+        # 同一进程内并发创建同一集合时串行化 (嵌入与写入在线程池中并发执行)
+        self._collection_lock = threading.Lock()
+        self.warmup_seconds: Optional[float] = None
 
-        # 创建持久化的 ChromaDB 客户端
-        self.client = chromadb.PersistentClient(
-            path=chroma_path,
+        # 嵌入模型名称
+        self.embedding_model = settings.embedding_model
+
+    @property
+    def client(self):
+        """ChromaDB 客户端 (首次访问时创建，导入 chromadb 与打开持久化目录较慢)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @staticmethod
+    def _create_client():
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        if settings.chroma_server_host:
+            # 服务模式: 多个 worker 进程通过 HTTP 共享同一个 chroma 服务 (进程安全)
+            return chromadb.HttpClient(
+                host=settings.chroma_server_host,
+                port=settings.chroma_server_port,
+                settings=ChromaSettings(anonymized_telemetry=False)
+            )
+
+        # 创建持久化的 ChromaDB 客户端 (嵌入式，只能由单个进程打开)
+        return chromadb.PersistentClient(
+            path=settings.get_chroma_path(),
             settings=ChromaSettings(
                 anonymized_telemetry=False,
                 allow_reset=True
             )
         )
 
-        # OpenRouter 客户端用于生成嵌入
-        self.embedding_client = OpenAI(
-            base_url=settings.openrouter_base_url,
-            api_key=settings.openrouter_api_key
-        )
+    @property
+    def embedding_client(self):
+        """OpenRouter 客户端用于生成嵌入"""
+        return get_sync_client()
 
-        # 嵌入模型名称
-        self.embedding_model = settings.embedding_model
+    @property
+    def ready(self) -> bool:
+        """ChromaDB 客户端是否已创建"""
+        return self._client is not None
+
+    def warm_up(self) -> float:
+        """创建 ChromaDB 客户端与嵌入客户端 (启动后在后台线程执行)，返回耗时秒数"""
+        started = time.perf_counter()
+        self.client.heartbeat()
+        get_sync_client()
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
 
     def get_or_create_collection(self, project_id: str):
         """获取或创建项目的向量集合"""
         collection_name = f"project_{project_id}"
 
-        # 使用余弦相似度
-        collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-
-        return collection
+        with self._collection_lock:
+            try:
+                # 使用余弦相似度
+                return self.client.get_or_create_collection(
+                    name=collection_name,
+                    metadata={"hnsw:space": "cosine"}
+                )
+            except Exception:
+                # 其他 worker 进程同时创建了该集合 (服务模式)，直接读取
+                return self.client.get_collection(name=collection_name)
 
     def get_embedding(self, text: str) -> List[float]:
         """
@@ -61,15 +111,31 @@ class VectorStore:
         Returns:
             向量列表 (通常是 1024 或 1536 维)
         """
+        cached = embedding_cache.get(self.embedding_model, text)
+        if embedding_cache.enabled:
+            EMBEDDING_CACHE.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+        timer = llm_stats.start("embedding", self.embedding_model)
+        EMBEDDING_BATCH_SIZE.observe(1)
         try:
-            response = self.embedding_client.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            with EMBEDDING_SECONDS.time():
+                response = self.embedding_client.embeddings.create(
+                    model=self.embedding_model,
+                    input=text
+                )
+            timer.finish()
+            EMBEDDING_REQUESTS.inc(status="ok")
         except Exception as e:
+            timer.finish(error=True)
+            EMBEDDING_REQUESTS.inc(status="error")
             raise Exception(f"Failed to generate embedding: {str(e)}")
 
+        embedding = response.data[0].embedding
+        embedding_cache.put(self.embedding_model, text, embedding)
+        return embedding
+
     def add_documents(
         self,
         project_id: str,
@@ -97,13 +163,21 @@ class VectorStore:
             ids = [f"{project_id}_chunk_{existing_count + i}"
                    for i in range(len(documents))]
 
-        # 添加到集合
-        collection.add(
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # ChromaDB 元数据值不允许为 None (如未知的 page_num)，去掉空值
+        metadatas = [
+            {key: value for key, value in metadata.items() if value is not None}
+            for metadata in metadatas
+        ]
+
+        # 写入集合 (upsert: 中断后重新解析同一文件时覆盖之前写入的部分块)
+        with CHROMA_SECONDS.time(op="add"):
+            collection.upsert(
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
+            )
+        answer_cache.invalidate(project_id)
 
         return ids
 
@@ -112,16 +186,18 @@ class VectorStore:
         project_id: str,
         query: str,
         top_k: int = 5,
-        filter_metadata: Optional[Dict] = None
+        filter_metadata: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict:
         """
-        语义搜索相关文档
+        语义搜索相关文档 (集合不存在时返回空结果，不会创建集合)
 
         Args:
             project_id: 项目ID
             query: 查询文本
             top_k: 返回结果数量
             filter_metadata: 元数据过滤条件
+            query_embedding: 已计算好的查询向量 (可选, 避免重复嵌入)
 
         Returns:
             {
@@ -131,17 +207,23 @@ class VectorStore:
                 "distances": [...]  # 余弦距离，越小越相似
             }
         """
-        collection = self.get_or_create_collection(project_id)
+        empty = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        try:
+            collection = self.client.get_collection(name=f"project_{project_id}")
+        except Exception:
+            return empty
 
         # 生成查询向量
-        query_embedding = self.get_embedding(query)
+        if query_embedding is None:
+            query_embedding = self.get_embedding(query)
 
         # 搜索
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=filter_metadata
-        )
+        with CHROMA_SECONDS.time(op="query"):
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where=filter_metadata
+            )
 
         return {
             "ids": results["ids"][0] if results["ids"] else [],
@@ -154,15 +236,97 @@ class VectorStore:
         """删除单个文档"""
         collection = self.get_or_create_collection(project_id)
         collection.delete(ids=[document_id])
+        answer_cache.invalidate(project_id)
 
     def delete_collection(self, project_id: str):
         """删除整个项目的向量集合"""
         collection_name = f"project_{project_id}"
+        answer_cache.invalidate(project_id)
         try:
             self.client.delete_collection(name=collection_name)
         except Exception:
             pass  # 集合不存在时忽略
 
+    def get_documents(self, project_id: str, ids: List[str]) -> Dict[str, Dict]:
+        """
+        按ID批量获取文档文本与元数据 (集合不存在时返回空字典，不会创建集合)
+
+        Returns:
+            {id: {"text": ..., "metadata": {...}}}
+        """
+        if not ids:
+            return {}
+        try:
+            collection = self.client.get_collection(name=f"project_{project_id}")
+        except Exception:
+            return {}
+        with CHROMA_SECONDS.time(op="get"):
+            results = collection.get(ids=ids, include=["documents", "metadatas"])
+        return {
+            doc_id: {"text": text, "metadata": metadata}
+            for doc_id, text, metadata in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        }
+
+    def count_documents(self, project_id: str) -> int:
+        """统计项目向量数量 (集合不存在时返回 0，不会创建集合)"""
+        try:
+            collection = self.client.get_collection(name=f"project_{project_id}")
+        except Exception:
+            return 0
+        return collection.count()
+
+    def iter_vectors(self, project_id: str, batch_size: int = 500) -> Iterator[Dict]:
+        """
+        分页遍历集合中的全部向量 (集合不存在时为空，不会创建集合)
+
+        Yields:
+            {"id": ..., "document": ..., "metadata": {...}, "embedding": 向量 (序列)}
+        """
+        try:
+            collection = self.client.get_collection(name=f"project_{project_id}")
+        except Exception:
+            return
+        offset = 0
+        while True:
+            with CHROMA_SECONDS.time(op="get"):
+                page = collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=batch_size,
+                    offset=offset
+                )
+            ids = page["ids"]
+            if not ids:
+                return
+            for index, doc_id in enumerate(ids):
+                yield {
+                    "id": doc_id,
+                    "document": page["documents"][index],
+                    "metadata": page["metadatas"][index] or {},
+                    "embedding": page["embeddings"][index]
+                }
+            offset += len(ids)
+
+    def upsert_vectors(
+        self,
+        project_id: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict]
+    ) -> None:
+        """写入已有的向量 (导入时使用，不调用嵌入 API)"""
+        collection = self.get_or_create_collection(project_id)
+        with CHROMA_SECONDS.time(op="add"):
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=[metadata or None for metadata in metadatas]
+            )
+        answer_cache.invalidate(project_id)
+
     def get_collection_stats(self, project_id: str) -> Dict:
         """获取集合统计信息"""
         collection = self.get_or_create_collection(project_id)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Benchmark concurrent SQLite reads/writes with default vs tuned engine settings.
+
+Writers mimic ``save_message`` (insert a message, update session and project,
+commit). Readers mimic ``GET /projects`` and the message list. Each variant
+runs against a fresh temporary database.
+
+Usage:
+    python scripts/bench_sqlite.py --seconds 10 --writers 4 --readers 8
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_sqlite_engine
+from app.models import ChatMessage, ChatSession, Project, beijing_now
+
+
+def seed(Session, projects: int = 20):
+    """Create projects with one session each."""
+    db = Session()
+    pairs = []
+    for i in range(projects):
+        project = Project(name=f"bench-{i}")
+        db.add(project)
+        db.flush()
+        session = ChatSession(project_id=project.id, title="Main")
+        db.add(session)
+        db.flush()
+        pairs.append((project.id, session.id))
+    db.commit()
+    db.close()
+    return pairs
+
+
+def writer(Session, pairs, stop, counters, index):
+    project_id, session_id = pairs[index % len(pairs)]
+    message_index = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            message_index += 1
+            db.add(ChatMessage(
+                session_id=session_id,
+                project_id=project_id,
+                role="assistant",
+                content="x" * 2000,
+                reasoning_trace="r" * 4000,
+                message_index=message_index,
+            ))
+            session = db.get(ChatSession, session_id)
+            session.message_count = message_index
+            session.last_message_at = beijing_now()
+            project = db.get(Project, project_id)
+            project.message_count = (project.message_count or 0) + 1
+            project.last_active_at = beijing_now()
+            db.commit()
+            counters["writes"] += 1
+        except OperationalError:
+            db.rollback()
+            counters["errors"] += 1
+        finally:
+            db.close()
+
+
+def reader(Session, pairs, stop, counters, index):
+    _, session_id = pairs[index % len(pairs)]
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.query(Project).order_by(Project.created_at.desc()).all()
+            (
+                db.query(ChatMessage)
+                .filter(ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.message_index.desc())
+                .limit(50)
+                .all()
+            )
+            counters["reads"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+        finally:
+            db.close()
+
+
+def run(tuned: bool, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", tuned=tuned)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        pairs = seed(Session)
+
+        counters = {"writes": 0, "reads": 0, "errors": 0}
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=writer, args=(Session, pairs, stop, counters, i))
+            for i in range(args.writers)
+        ] + [
+            threading.Thread(target=reader, args=(Session, pairs, stop, counters, i))
+            for i in range(args.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return {key: value / args.seconds for key, value in counters.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds}s per variant\n")
+    print(f"{'variant':<10}{'writes/s':>12}{'reads/s':>12}{'errors/s':>12}")
+    for label, tuned in (("default", False), ("tuned", True)):
+        result = run(tuned, args)
+        print(f"{label:<10}{result['writes']:>12.1f}{result['reads']:>12.1f}{result['errors']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
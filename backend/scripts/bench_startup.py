@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Measure backend cold-start time the way Electron launches it.
+
+Each run starts ``python -m uvicorn app.main:app`` in a fresh process and
+polls ``/health`` (process is serving requests) and ``/ready`` (database
+initialised and Chroma client warmed up). Also reports the bare import time of
+``app.main``; pass ``--importtime`` to list the slowest imported modules.
+
+Usage:
+    python scripts/bench_startup.py --runs 5 --port 8765
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def measure_import() -> float:
+    """Seconds to import app.main in a fresh interpreter."""
+    code = (
+        "import time; t = time.perf_counter(); import app.main; "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR,
+        capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 15):
+    """(cumulative microseconds, module) for the slowest imports of app.main."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def wait_for(client: httpx.Client, url: str, started: float, timeout: float) -> float:
+    """Poll url until it returns 200; seconds since started."""
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def measure_server(port: int, timeout: float):
+    """(seconds to /health, seconds to /ready) for one cold start."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=dict(os.environ),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        with httpx.Client(timeout=1.0) as client:
+            health = wait_for(client, f"{base}/health", started, timeout)
+            ready = wait_for(client, f"{base}/ready", started, timeout)
+        return health, ready
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--importtime", action="store_true", help="list slowest imports")
+    args = parser.parse_args()
+
+    imports, healths, readies = [], [], []
+    for run in range(args.runs):
+        imports.append(measure_import())
+        health, ready = measure_server(args.port, args.timeout)
+        healths.append(health)
+        readies.append(ready)
+        print(f"run {run + 1}: import {imports[-1]:.3f}s  /health {health:.3f}s  /ready {ready:.3f}s")
+
+    print(f"\n{'metric':<16}{'median':>10}{'min':>10}{'max':>10}")
+    for label, values in (("import", imports), ("/health", healths), ("/ready", readies)):
+        print(f"{label:<16}{statistics.median(values):>10.3f}{min(values):>10.3f}{max(values):>10.3f}")
+
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for micros, module in slowest_imports():
+            print(f"{micros / 1000:>10.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
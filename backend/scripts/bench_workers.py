@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Benchmark read throughput of the backend against the uvicorn worker count.
+
+Seeds a temporary database (projects, sessions, long messages), then for each
+worker count starts ``uvicorn app.main:app --workers N`` on it and drives the
+SQLite/serialization-bound endpoints (project list, message page, project
+stats) with concurrent clients. External services (OpenRouter, MinerU,
+Chroma) are not needed; the numbers show how request handling scales with
+cores, not how LLM-bound chat scales.
+
+Usage:
+    python scripts/bench_workers.py --workers 1 2 4 --seconds 10 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+TMP_DIR = tempfile.mkdtemp(prefix="papermem-bench-")
+os.environ["SQLITE_DB_PATH"] = str(Path(TMP_DIR) / "bench.db")
+os.environ["CHROMA_PERSIST_DIR"] = str(Path(TMP_DIR) / "chromadb")
+os.environ["PARSED_FILES_DIR"] = str(Path(TMP_DIR) / "Parsed")
+os.environ["STATS_RECONCILE_INTERVAL_HOURS"] = "0"
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.models import ChatMessage, ChatSession, Project  # noqa: E402
+
+
+def seed(projects: int, messages: int):
+    """Create projects with one session of long messages each; returns project ids."""
+    init_db()
+    db = SessionLocal()
+    ids = []
+    for i in range(projects):
+        project = Project(name=f"bench-{i}", message_count=messages)
+        db.add(project)
+        db.flush()
+        session = ChatSession(project_id=project.id, title="Main", message_count=messages)
+        db.add(session)
+        db.flush()
+        for index in range(1, messages + 1):
+            db.add(ChatMessage(
+                session_id=session.id,
+                project_id=project.id,
+                role="assistant" if index % 2 == 0 else "user",
+                content="answer " * 300,
+                message_index=index,
+            ))
+        ids.append(project.id)
+    db.commit()
+    db.close()
+    return ids
+
+
+async def drive(base: str, project_ids, seconds: float, concurrency: int):
+    """Run concurrent clients for `seconds`; returns (latencies, errors)."""
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        async def user(index: int):
+            nonlocal errors
+            project_id = project_ids[index % len(project_ids)]
+            paths = ("/projects", f"/projects/{project_id}/messages?limit=50", f"/projects/{project_id}/stats")
+            step = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(paths[step % len(paths)])
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+                step += 1
+
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def wait_healthy(base: str, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError("server did not start")
+
+
+def run(workers: int, args, project_ids) -> dict:
+    base = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(args.port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(os.environ),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(base)
+        # 预热连接与各 worker 的连接池
+        asyncio.run(drive(base, project_ids, 1, args.concurrency))
+        latencies, errors = asyncio.run(drive(base, project_ids, args.seconds, args.concurrency))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    ordered = sorted(latencies)
+    return {
+        "rps": len(latencies) / args.seconds,
+        "p50": statistics.median(ordered) * 1000,
+        "p95": ordered[int(len(ordered) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    project_ids = seed(args.projects, args.messages)
+    print(f"data dir {TMP_DIR}, {args.concurrency} clients, {args.seconds}s per run "
+          f"({os.cpu_count()} CPUs)\n")
+    print(f"{'workers':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>10}{'speedup':>10}")
+    baseline = None
+    for workers in args.workers:
+        result = run(workers, args, project_ids)
+        baseline = baseline or result["rps"]
+        print(f"{workers:<10}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+              f"{result['errors']:>10}{result['rps'] / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
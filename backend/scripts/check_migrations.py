@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Check that migrations preserve data in databases created by older versions.
+
+Each scenario builds a temporary database with an older schema, seeds it,
+runs the same steps as ``init_db()`` (``create_all`` + migration runner) and
+verifies the migrated rows. Exits non-zero on any failure.
+
+Scenarios:
+
+- ``baseline``: the original schema, where ``chat_messages.search_results``
+  holds ``[{text, metadata, distance}]`` without chunk ids. Every source must
+  land in ``message_sources`` (as a snapshot) before the column is dropped.
+- ``unconvertible``: a ``search_results`` value that is not valid JSON. The
+  column must be kept, with the value intact.
+
+Usage:
+    python scripts/check_migrations.py
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.database import Base, create_sqlite_engine
+from app.migrations import run_migrations
+from app.sources import group_sources, sources_query
+
+# Schema as created by create_all() before the optimization series
+BASELINE_SCHEMA = (
+    "CREATE TABLE projects (id VARCHAR(36) NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+    "type VARCHAR(100), description TEXT, message_count INTEGER, file_count INTEGER, "
+    "last_message_preview VARCHAR(200), created_at DATETIME, updated_at DATETIME, "
+    "last_active_at DATETIME, status VARCHAR(20))",
+    "CREATE TABLE chat_sessions (id VARCHAR(36) NOT NULL PRIMARY KEY, "
+    "project_id VARCHAR(36) NOT NULL REFERENCES projects (id), title VARCHAR(255), "
+    "message_count INTEGER, is_current BOOLEAN, created_at DATETIME, last_message_at DATETIME)",
+    "CREATE TABLE files (id VARCHAR(36) NOT NULL PRIMARY KEY, "
+    "project_id VARCHAR(36) NOT NULL REFERENCES projects (id), file_name VARCHAR(255) NOT NULL, "
+    "file_path VARCHAR(500), file_url VARCHAR(500), file_type VARCHAR(50), file_size INTEGER, "
+    "mineru_task_id VARCHAR(100), parse_status VARCHAR(50), markdown_path VARCHAR(500), "
+    "chunks_count INTEGER, created_at DATETIME, parsed_at DATETIME)",
+    "CREATE TABLE chat_messages (id VARCHAR(36) NOT NULL PRIMARY KEY, "
+    "session_id VARCHAR(36) NOT NULL REFERENCES chat_sessions (id), "
+    "project_id VARCHAR(36) NOT NULL REFERENCES projects (id), role VARCHAR(50) NOT NULL, "
+    "content TEXT NOT NULL, reasoning_trace TEXT, search_results TEXT, has_thinking BOOLEAN, "
+    "message_index INTEGER, created_at DATETIME)",
+)
+
+LEGACY_SOURCES = [
+    {"text": "Dense retrieval maps queries and passages into one space.",
+     "metadata": {"source_file": "dpr.pdf", "section": "Intro", "chunk_index": 3},
+     "distance": 0.21},
+    {"text": "BM25 remains a strong baseline.",
+     "metadata": {"source_file": "bm25.pdf", "section": "Results", "chunk_index": 7},
+     "distance": 0.34},
+]
+
+
+def seed_baseline(conn, search_results: str) -> None:
+    for statement in BASELINE_SCHEMA:
+        conn.execute(text(statement))
+    conn.execute(text(
+        "INSERT INTO projects (id, name, message_count, file_count, created_at, status) "
+        "VALUES ('p', 'demo', 2, 0, '2025-01-01 00:00:00', 'active')"
+    ))
+    conn.execute(text(
+        "INSERT INTO chat_sessions (id, project_id, message_count, is_current, created_at) "
+        "VALUES ('s', 'p', 2, 1, '2025-01-01 00:00:00')"
+    ))
+    conn.execute(text(
+        "INSERT INTO chat_messages (id, session_id, project_id, role, content, search_results, "
+        "has_thinking, message_index, created_at) VALUES "
+        "('m1', 's', 'p', 'user', 'what is dense retrieval?', NULL, 0, 1, '2025-01-01 00:00:01'), "
+        "('m2', 's', 'p', 'assistant', 'It embeds [1].', :sources, 0, 2, '2025-01-01 00:00:02')"
+    ), {"sources": search_results})
+
+
+def migrate(engine) -> None:
+    """Same steps as init_db()."""
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+def columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def check_baseline(engine) -> list:
+    with engine.begin() as conn:
+        seed_baseline(conn, json.dumps(LEGACY_SOURCES, ensure_ascii=False))
+    migrate(engine)
+
+    errors = []
+    with engine.connect() as conn:
+        if "search_results" in columns(conn, "chat_messages"):
+            errors.append("search_results column was not dropped after conversion")
+        sources = group_sources(conn.execute(sources_query("p", ["m2"]))).get("m2", [])
+    expected = [
+        {"id": None, "rank": rank, "distance": src["distance"],
+         "text": src["text"], "metadata": src["metadata"]}
+        for rank, src in enumerate(LEGACY_SOURCES, start=1)
+    ]
+    if sources != expected:
+        errors.append(f"legacy sources not preserved: {sources}")
+    return errors
+
+
+def check_unconvertible(engine) -> list:
+    raw = "{not json"
+    with engine.begin() as conn:
+        seed_baseline(conn, raw)
+    migrate(engine)
+
+    with engine.connect() as conn:
+        if "search_results" not in columns(conn, "chat_messages"):
+            return ["search_results column dropped although a row was not converted"]
+        value = conn.execute(text("SELECT search_results FROM chat_messages WHERE id = 'm2'")).scalar()
+    return [] if value == raw else [f"search_results value changed: {value!r}"]
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, check in (
+            ("baseline", check_baseline),
+            ("unconvertible", check_unconvertible),
+        ):
+            engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / f'{name}.db'}")
+            errors = check(engine)
+            engine.dispose()
+            failures += len(errors)
+            print(f"[{'FAIL' if errors else 'OK'}] {name}")
+            for error in errors:
+                print(f"    {error}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Check that hot queries are served by the composite indexes.
+
+Builds a temporary database with the pre-migration schema (composite indexes
+dropped, as in an existing user database), runs the migration runner, then
+runs EXPLAIN QUERY PLAN for each hot query. Exits non-zero if a query does
+not use its expected index.
+
+Usage:
+    python scripts/check_query_plans.py
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import literal, text, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_sqlite_engine
+from app.main import PROJECT_SUMMARY_COLUMNS, UNAVAILABLE_STATUSES
+from app.migrations import run_migrations
+from app.models import ChatMessage, ChatSession, File, Project
+
+COMPOSITE_INDEXES = (
+    "ix_chat_messages_session_index",
+    "ix_chat_sessions_project_current",
+    "ix_files_project_created",
+    "ix_projects_status_active",
+    "ix_projects_active_id",
+    "ix_projects_created_id",
+)
+
+
+def hot_queries(db):
+    """(expected index, query) pairs mirroring the endpoints."""
+    return [
+        (
+            "ix_chat_messages_session_index",
+            db.query(ChatMessage)
+            .filter(ChatMessage.session_id == "s", ChatMessage.message_index < 100)
+            .order_by(ChatMessage.message_index.desc())
+            .limit(51),
+        ),
+        (
+            "ix_chat_sessions_project_current",
+            db.query(ChatSession)
+            .filter(ChatSession.project_id == "p", ChatSession.is_current.is_(True))
+            .order_by(ChatSession.created_at.desc())
+            .limit(1),
+        ),
+        (
+            "ix_files_project_created",
+            db.query(File)
+            .filter(File.project_id == "p")
+            .order_by(File.created_at.asc()),
+        ),
+        # Sidebar: GET /projects?view=summary&sort=active (no status filter)
+        (
+            "ix_projects_active_id",
+            db.query(*PROJECT_SUMMARY_COLUMNS, Project.last_active_at)
+            .filter(Project.status.notin_(UNAVAILABLE_STATUSES))
+            .order_by(Project.last_active_at.desc(), Project.id.desc()),
+        ),
+        # Next page of the same list (limit + cursor)
+        (
+            "ix_projects_active_id",
+            db.query(*PROJECT_SUMMARY_COLUMNS, Project.last_active_at)
+            .filter(
+                Project.status.notin_(UNAVAILABLE_STATUSES),
+                tuple_(Project.last_active_at, Project.id) < tuple_(literal("2025-01-01 00:00:00"), literal("p"))
+            )
+            .order_by(Project.last_active_at.desc(), Project.id.desc())
+            .limit(51),
+        ),
+        # Default GET /projects
+        (
+            "ix_projects_created_id",
+            db.query(Project)
+            .filter(Project.status.notin_(UNAVAILABLE_STATUSES))
+            .order_by(Project.created_at.desc(), Project.id.desc()),
+        ),
+        # GET /projects?status=active&sort=active&limit=50
+        (
+            "ix_projects_status_active",
+            db.query(Project)
+            .filter(Project.status.notin_(UNAVAILABLE_STATUSES), Project.status == "active")
+            .order_by(Project.last_active_at.desc(), Project.id.desc())
+            .limit(51),
+        ),
+    ]
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'plans.db'}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for name in COMPOSITE_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        executed = run_migrations(engine)
+        print(f"migrations applied: {executed}")
+        if run_migrations(engine):
+            print("FAIL: migrations are not idempotent")
+            failures += 1
+
+        db = sessionmaker(bind=engine)()
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+            for expected, query in hot_queries(db):
+                sql = str(query.statement.compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                ))
+                plan = " | ".join(
+                    row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+                )
+                ok = expected in plan and "USE TEMP B-TREE" not in plan
+                failures += 0 if ok else 1
+                print(f"[{'OK' if ok else 'FAIL'}] {expected}: {plan}")
+        db.close()
+        engine.dispose()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
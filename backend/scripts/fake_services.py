@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Offline stand-ins for OpenRouter (OpenAI-compatible) and the MinerU task API.
+
+Serves, on one port:
+
+- ``POST /v1/embeddings``: deterministic pseudo-embeddings after
+  ``--embed-latency-ms``.
+- ``POST /v1/chat/completions``: streamed (SSE) or plain completions. The
+  first token arrives after ``--ttft-ms`` and later ones at
+  ``--tokens-per-sec``. Streams end with a usage chunk.
+- ``POST /api/v4/extract/task`` and ``GET /api/v4/extract/task/{id}``: MinerU
+  tasks complete ``--mineru-latency-ms`` after submission and return a
+  generated markdown paper with ``--mineru-sections`` sections.
+
+Point the backend at it with::
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/v1
+    MINERU_API_URL=http://127.0.0.1:9100/api/v4/extract/task
+
+Usage:
+    python scripts/fake_services.py --port 9100 --ttft-ms 300 --tokens-per-sec 80
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = (
+    "retrieval augmented generation grounds answers in source documents while "
+    "dense embeddings capture semantic similarity between queries and passages"
+).split()
+
+
+class FakeConfig:
+    embed_latency_ms = 20.0
+    embed_dims = 256
+    ttft_ms = 300.0
+    tokens_per_sec = 80.0
+    output_tokens = 120
+    reasoning_tokens = 0
+    mineru_latency_ms = 500.0
+    mineru_sections = 12
+
+
+config = FakeConfig()
+app = FastAPI(title="PaperMem fake services")
+_tasks: Dict[str, float] = {}
+
+
+def fake_embedding(text: str, dims: int) -> List[float]:
+    """Deterministic unit vector derived from the text hash."""
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    values = [
+        math.sin((seed[i % len(seed)] + 1) * (i + 1)) for i in range(dims)
+    ]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def fake_markdown(sections: int) -> str:
+    parts = ["# A Fake Paper\n"]
+    for index in range(sections):
+        body = " ".join(WORDS[(index + j) % len(WORDS)] for j in range(120))
+        parts.append(f"## Section {index + 1}\n\n{body}.\n")
+    return "\n".join(parts)
+
+
+@app.post("/v1/embeddings")
+async def embeddings(payload: Dict[str, Any]) -> Dict[str, Any]:
+    await asyncio.sleep(config.embed_latency_ms / 1000)
+    inputs = payload.get("input")
+    texts = [inputs] if isinstance(inputs, str) else list(inputs or [])
+    return {
+        "object": "list",
+        "model": payload.get("model", "fake-embedding"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text, config.embed_dims)}
+            for i, text in enumerate(texts)
+        ],
+        "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)},
+    }
+
+
+def _chunk(model: str, completion_id: str, delta: Dict[str, Any], usage=None) -> str:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": None}],
+    }
+    if usage:
+        body["usage"] = usage
+    return f"data: {json.dumps(body)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    model = payload.get("model", "fake-chat")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    # extra_body={"reasoning": {...}} is merged into the request body by the SDK
+    reasoning = payload.get("reasoning") or {}
+    reasoning_enabled = bool(reasoning.get("enabled")) if isinstance(reasoning, dict) else False
+    max_tokens = payload.get("max_tokens") or config.output_tokens
+    n_tokens = min(config.output_tokens, max_tokens)
+    n_reasoning = config.reasoning_tokens if reasoning_enabled else 0
+    interval = 1 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+    usage = {"prompt_tokens": 100, "completion_tokens": n_tokens + n_reasoning,
+             "total_tokens": 100 + n_tokens + n_reasoning}
+
+    if not payload.get("stream"):
+        await asyncio.sleep(config.ttft_ms / 1000 + n_tokens * interval)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(WORDS[i % len(WORDS)] for i in range(n_tokens))},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    async def stream():
+        await asyncio.sleep(config.ttft_ms / 1000)
+        for i in range(n_reasoning):
+            yield _chunk(model, completion_id, {"reasoning": WORDS[i % len(WORDS)] + " "})
+            await asyncio.sleep(interval)
+        for i in range(n_tokens):
+            yield _chunk(model, completion_id, {"content": WORDS[i % len(WORDS)] + " "})
+            await asyncio.sleep(interval)
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield _chunk(model, completion_id, {}, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/api/v4/extract/task")
+async def mineru_submit(payload: Dict[str, Any]) -> Dict[str, Any]:
+    task_id = uuid.uuid4().hex
+    _tasks[task_id] = time.monotonic() + config.mineru_latency_ms / 1000
+    return {"code": 0, "data": {"task_id": task_id, "status": "processing"}}
+
+
+@app.get("/api/v4/extract/task/{task_id}")
+async def mineru_status(task_id: str) -> Dict[str, Any]:
+    ready_at = _tasks.get(task_id)
+    if ready_at is None:
+        raise HTTPException(status_code=404, detail="Unknown task")
+    if time.monotonic() < ready_at:
+        return {"code": 0, "data": {"task_id": task_id, "status": "processing"}}
+    _tasks.pop(task_id, None)
+    return {"code": 0, "data": {
+        "task_id": task_id,
+        "status": "completed",
+        "markdown": fake_markdown(config.mineru_sections),
+    }}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Latency knobs shared with scripts/loadtest.py."""
+    parser.add_argument("--embed-latency-ms", type=float, default=FakeConfig.embed_latency_ms)
+    parser.add_argument("--embed-dims", type=int, default=FakeConfig.embed_dims)
+    parser.add_argument("--ttft-ms", type=float, default=FakeConfig.ttft_ms)
+    parser.add_argument("--tokens-per-sec", type=float, default=FakeConfig.tokens_per_sec)
+    parser.add_argument("--output-tokens", type=int, default=FakeConfig.output_tokens)
+    parser.add_argument("--reasoning-tokens", type=int, default=FakeConfig.reasoning_tokens)
+    parser.add_argument("--mineru-latency-ms", type=float, default=FakeConfig.mineru_latency_ms)
+    parser.add_argument("--mineru-sections", type=int, default=FakeConfig.mineru_sections)
+
+
+def apply_arguments(args: argparse.Namespace) -> None:
+    for name in (
+        "embed_latency_ms", "embed_dims", "ttft_ms", "tokens_per_sec", "output_tokens",
+        "reasoning_tokens", "mineru_latency_ms", "mineru_sections",
+    ):
+        setattr(config, name, getattr(args, name))
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    apply_arguments(args)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""HTTP load test of the backend against local OpenRouter/MinerU stand-ins.
+
+Starts ``scripts/fake_services.py`` and the backend (uvicorn) on a temporary
+data directory, seeds projects by uploading papers through the fake MinerU,
+then drives each scenario with a fixed number of closed-loop clients:
+
+- ``search``: ``POST /search`` with distinct queries (no embedding cache hits)
+- ``chat``: ``POST /chat/stream`` read to the end; also reports time to first
+  content chunk
+- ``upload``: ``POST /projects/{id}/upload`` with distinct file URLs
+
+Reports throughput, error rate and p50/p95/p99 latency per scenario. Runs
+fully offline. ``--json`` saves the results with the current commit, and
+``--compare`` prints the deltas against a previous run.
+
+Usage:
+    python scripts/loadtest.py --concurrency 8 --seconds 20 --json out.json
+    python scripts/loadtest.py --scenarios chat --ttft-ms 500 --compare out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from fake_services import add_arguments
+
+BACKEND_DIR = Path(__file__).parent.parent
+SCRIPTS_DIR = Path(__file__).parent
+SCENARIOS = ("search", "chat", "upload")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+class Recorder:
+    """Per-scenario latency samples and error counts."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors: Dict[str, int] = {}
+
+    def ok(self, latency: float, ttft: Optional[float] = None) -> None:
+        self.latencies.append(latency)
+        if ttft is not None:
+            self.ttfts.append(ttft)
+
+    def error(self, latency: float, reason: str) -> None:
+        self.latencies.append(latency)
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def summary(self, seconds: float) -> Dict:
+        ordered = sorted(self.latencies)
+        ttfts = sorted(self.ttfts)
+        errors = sum(self.errors.values())
+        ms = lambda value: round(value * 1000, 1) if value is not None else None  # noqa: E731
+        return {
+            "requests": len(ordered),
+            "throughput_rps": round(len(ordered) / seconds, 2),
+            "error_rate": round(errors / len(ordered), 4) if ordered else 0,
+            "errors": self.errors,
+            "p50_ms": ms(percentile(ordered, 50)),
+            "p95_ms": ms(percentile(ordered, 95)),
+            "p99_ms": ms(percentile(ordered, 99)),
+            "ttft_p50_ms": ms(percentile(ttfts, 50)),
+            "ttft_p95_ms": ms(percentile(ttfts, 95)),
+        }
+
+
+async def search_once(client: httpx.AsyncClient, project_id: str, n: int, rec: Recorder) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.post("/search", json={
+            "project_id": project_id, "query": f"dense retrieval question {n}", "top_k": 5
+        })
+        latency = time.perf_counter() - started
+        if response.status_code == 200:
+            rec.ok(latency)
+        else:
+            rec.error(latency, f"http_{response.status_code}")
+    except httpx.HTTPError as e:
+        rec.error(time.perf_counter() - started, type(e).__name__)
+
+
+async def chat_once(client: httpx.AsyncClient, project_id: str, n: int, rec: Recorder, mode: str) -> None:
+    started = time.perf_counter()
+    ttft = None
+    failure = None
+    try:
+        async with client.stream("POST", "/chat/stream", json={
+            "project_id": project_id, "query": f"how does retrieval grounding work? ({n})", "mode": mode
+        }) as response:
+            if response.status_code != 200:
+                failure = f"http_{response.status_code}"
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[6:])
+                    if event.get("type") == "content_chunk" and ttft is None:
+                        ttft = time.perf_counter() - started
+                    elif event.get("type") == "error":
+                        failure = "stream_error"
+    except httpx.HTTPError as e:
+        failure = type(e).__name__
+
+    latency = time.perf_counter() - started
+    if failure:
+        rec.error(latency, failure)
+    else:
+        rec.ok(latency, ttft)
+
+
+async def upload_once(client: httpx.AsyncClient, project_id: str, n: int, rec: Recorder) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.post(f"/projects/{project_id}/upload", params={
+            "file_url": f"https://example.invalid/loadtest/{n}-{time.time_ns()}.pdf",
+            "file_name": f"loadtest-{n}.pdf",
+        })
+        latency = time.perf_counter() - started
+        if response.status_code == 200:
+            rec.ok(latency)
+        else:
+            rec.error(latency, f"http_{response.status_code}")
+    except httpx.HTTPError as e:
+        rec.error(time.perf_counter() - started, type(e).__name__)
+
+
+async def run_scenario(base: str, scenario: str, project_ids: List[str], args) -> Dict:
+    rec = Recorder()
+    deadline = time.perf_counter() + args.seconds
+    counter = iter(range(10 ** 9))
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=args.request_timeout) as client:
+        async def worker(index: int) -> None:
+            project_id = project_ids[index % len(project_ids)]
+            while time.perf_counter() < deadline:
+                n = next(counter)
+                if scenario == "search":
+                    await search_once(client, project_id, n, rec)
+                elif scenario == "chat":
+                    await chat_once(client, project_id, n, rec, args.mode)
+                else:
+                    await upload_once(client, project_id, n, rec)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return rec.summary(elapsed)
+
+
+async def seed(base: str, args) -> List[str]:
+    """Create projects and ingest papers through the fake MinerU."""
+    project_ids = []
+    async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+        for i in range(args.projects):
+            response = await client.post("/projects", json={"name": f"loadtest-{i}"})
+            response.raise_for_status()
+            project_ids.append(response.json()["id"])
+        uploads = [
+            client.post(f"/projects/{project_id}/upload", params={
+                "file_url": f"https://example.invalid/seed/{project_id}/{j}.pdf",
+                "file_name": f"seed-{j}.pdf",
+            })
+            for project_id in project_ids for j in range(args.seed_files)
+        ]
+        for response in await asyncio.gather(*uploads):
+            if response.status_code != 200:
+                raise RuntimeError(f"seed upload failed ({response.status_code}): {response.text}")
+    return project_ids
+
+
+def print_table(results: Dict[str, Dict]) -> None:
+    header = f"{'scenario':<10}{'reqs':>7}{'req/s':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft50':>9}{'ttft95':>9}"
+    print(header)
+    for name, r in results.items():
+        fmt = lambda v: f"{v:>9.1f}" if v is not None else f"{'-':>9}"  # noqa: E731
+        print(f"{name:<10}{r['requests']:>7}{r['throughput_rps']:>9.2f}{r['error_rate'] * 100:>7.1f}"
+              f"{fmt(r['p50_ms'])}{fmt(r['p95_ms'])}{fmt(r['p99_ms'])}{fmt(r['ttft_p50_ms'])}{fmt(r['ttft_p95_ms'])}")
+        if r["errors"]:
+            print(f"{'':<10}errors: {r['errors']}")
+
+
+def print_comparison(results: Dict[str, Dict], baseline: Dict) -> None:
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        deltas = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms"):
+            old, new = base.get(key), r.get(key)
+            if old and new is not None:
+                deltas.append(f"{key} {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+        print(f"  {name}: " + "; ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--projects", type=int, default=2)
+    parser.add_argument("--seed-files", type=int, default=2)
+    parser.add_argument("--mode", default="standard", help="chat mode sent to /chat/stream")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the backend")
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--compare", type=Path, help="baseline results file to diff against")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    data_dir = Path(tempfile.mkdtemp(prefix="papermem-loadtest-"))
+    fake_port, api_port = free_port(), free_port()
+    fake_args = [
+        f"--{name.replace('_', '-')}={getattr(args, name)}"
+        for name in ("embed_latency_ms", "embed_dims", "ttft_ms", "tokens_per_sec", "output_tokens",
+                     "reasoning_tokens", "mineru_latency_ms", "mineru_sections")
+    ]
+    env = {
+        **os.environ,
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENROUTER_API_KEY": "loadtest",
+        "MINERU_API_URL": f"http://127.0.0.1:{fake_port}/api/v4/extract/task",
+        "MINERU_API_TOKEN": "loadtest",
+        "SQLITE_DB_PATH": str(data_dir / "papermem.db"),
+        "CHROMA_PERSIST_DIR": str(data_dir / "chromadb"),
+        "PARSED_FILES_DIR": str(data_dir / "Parsed"),
+        "RAW_FILES_DIR": str(data_dir / "Raw"),
+        "STATS_RECONCILE_INTERVAL_HOURS": "0",
+    }
+    backend_log = open(data_dir / "backend.log", "w")
+    processes = [
+        subprocess.Popen(
+            [sys.executable, str(SCRIPTS_DIR / "fake_services.py"), "--port", str(fake_port), *fake_args],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(api_port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=backend_log, stderr=subprocess.STDOUT
+        ),
+    ]
+    base = f"http://127.0.0.1:{api_port}"
+
+    try:
+        wait_ready(f"http://127.0.0.1:{fake_port}/docs")
+        wait_ready(f"{base}/ready")
+        project_ids = asyncio.run(seed(base, args))
+        print(f"data dir {data_dir} (backend log: backend.log); {args.projects} projects x {args.seed_files} papers; "
+              f"{args.concurrency} clients, {args.seconds}s per scenario\n")
+
+        results = {}
+        for scenario in args.scenarios:
+            results[scenario] = asyncio.run(run_scenario(base, scenario, project_ids, args))
+    finally:
+        for proc in processes:
+            proc.terminate()
+            proc.wait()
+        backend_log.close()
+
+    print_table(results)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: str(value) for key, value in vars(args).items() if key not in ("json", "compare")},
+        "results": results,
+    }
+    if args.compare and args.compare.exists():
+        print_comparison(results, json.loads(args.compare.read_text()))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nresults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
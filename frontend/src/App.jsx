@@ -32,7 +32,7 @@ export default function App() {
 
   const fetchProjects = useCallback(async () => {
     try {
-      const response = await fetch(`${API_BASE}/projects`);
+      const response = await fetch(`${API_BASE}/projects?view=summary&sort=active`);
       const data = await response.json();
       setProjects(data);
       if (data.length > 0 && !currentProject) {
@@ -14,6 +14,20 @@ export default function ChatPanel({ projectId, apiBase, onOpenSource }) {
 
   useEffect(scrollToBottom, [messages]);
 
+  const refetchAnswer = async (query) => {
+    for (let attempt = 0; attempt < 120; attempt++) {
+      const res = await fetch(`${apiBase}/projects/${projectId}/messages?limit=2`);
+      if (res.ok) {
+        const [prev, last] = await res.json();
+        if (prev?.role === 'user' && prev.content === query && last?.role === 'assistant') {
+          return last.content;
+        }
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+    return null;
+  };
+
   const handleSend = async () => {
     if (!input.trim() || isStreaming) return;
 
@@ -23,6 +37,7 @@ export default function ChatPanel({ projectId, apiBase, onOpenSource }) {
       timestamp: new Date()
     };
 
+    const query = input;
     setMessages(prev => [...prev, userMessage]);
     setInput('');
     setIsStreaming(true);
@@ -32,14 +47,14 @@ export default function ChatPanel({ projectId, apiBase, onOpenSource }) {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
-          query: input,
+          query,
           project_id: projectId,
           top_k: 5
         })
       });
-
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
+      if (!response.ok) {
+        throw new Error(`Chat request failed: ${response.status}`);
+      }
 
       let assistantMessage = {
         role: 'assistant',
@@ -52,42 +67,96 @@ export default function ChatPanel({ projectId, apiBase, onOpenSource }) {
 
       setMessages(prev => [...prev, assistantMessage]);
 
-      let buffer = '';
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
-
-        buffer += decoder.decode(value, { stream: true });
-        const lines = buffer.split('\n');
-        buffer = lines.pop() || '';
-
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
-            try {
-              const event = JSON.parse(line.slice(6));
-
-              if (event.type === 'search') {
-                assistantMessage.contexts = event.contexts || [];
-              } else if (event.type === 'reasoning') {
-                assistantMessage.reasoning += event.content;
-              } else if (event.type === 'content_chunk') {
-                assistantMessage.content += event.content;
-              } else if (event.type === 'done') {
-                assistantMessage.content = event.full_content || assistantMessage.content;
-                assistantMessage.reasoning = event.reasoning_trace || assistantMessage.reasoning;
-                assistantMessage.isStreaming = false;
-              }
+      // 断线续传: 记录流 ID 和最后收到的事件 ID
+      let streamId = response.headers.get('X-Stream-Id');
+      let lastEventId = 0;
+      let finished = false;
+      let gapped = false;
+
+      const handleEvent = (event) => {
+        if (event.type === 'stream') {
+          streamId = event.stream_id;
+        } else if (event.type === 'search') {
+          assistantMessage.contexts = event.contexts || [];
+        } else if (event.type === 'reasoning') {
+          assistantMessage.reasoning += event.content;
+        } else if (event.type === 'content_chunk') {
+          assistantMessage.content += event.content;
+        } else if (event.type === 'done') {
+          assistantMessage.content = event.full_content || assistantMessage.content;
+          assistantMessage.reasoning = event.reasoning_trace || assistantMessage.reasoning;
+          assistantMessage.isStreaming = false;
+          finished = true;
+        } else if (event.type === 'error') {
+          finished = true;
+        } else if (event.type === 'gap') {
+          // 落后于服务端缓冲区，事件已无法续传
+          gapped = true;
+          finished = true;
+        }
 
-              setMessages(prev => {
-                const newMessages = [...prev];
-                newMessages[newMessages.length - 1] = { ...assistantMessage };
-                return newMessages;
-              });
-            } catch (e) {
-              // Ignore parse errors
+        setMessages(prev => {
+          const newMessages = [...prev];
+          newMessages[newMessages.length - 1] = { ...assistantMessage };
+          return newMessages;
+        });
+      };
+
+      const readStream = async (res) => {
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let pendingId = null;
+
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop() || '';
+
+          for (const line of lines) {
+            if (line.startsWith('id: ')) {
+              pendingId = Number(line.slice(4));
+            } else if (line.startsWith('data: ')) {
+              try {
+                handleEvent(JSON.parse(line.slice(6)));
+                if (pendingId !== null) lastEventId = pendingId;
+              } catch (e) {
+                // Ignore parse errors
+              }
+              pendingId = null;
             }
           }
         }
+      };
+
+      let res = response;
+      for (let attempt = 0; ; attempt++) {
+        try {
+          await readStream(res);
+        } catch (e) {
+          if (!streamId || attempt >= 3) throw e;
+        }
+        if (finished || !streamId || attempt >= 3) break;
+
+        res = await fetch(`${apiBase}/chat/stream/${streamId}`, {
+          headers: { 'Last-Event-ID': String(lastEventId) }
+        });
+        if (!res.ok) break;
+      }
+
+      if (gapped) {
+        // 等待服务端生成结束，从消息历史读取完整回答
+        const content = await refetchAnswer(query);
+        if (content !== null) assistantMessage.content = content;
+        assistantMessage.isStreaming = false;
+        setMessages(prev => {
+          const newMessages = [...prev];
+          newMessages[newMessages.length - 1] = { ...assistantMessage };
+          return newMessages;
+        });
       }
     } catch (error) {
       console.error('Chat error:', error);